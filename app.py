@@ -7,12 +7,110 @@ import streamlit as st
 from dotenv import load_dotenv
 import os
 import re
-import io
+import json
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict, deque
 from datetime import datetime
-from pypdf import PdfReader
-from fpdf import FPDF
+from functools import partial
 
-from job_crew import create_crew
+import pymupdf
+
+from embeddings import embed_text
+from pdf_export import export_to_pdf, export_full_report_pdf
+
+logger = logging.getLogger(__name__)
+
+# Most recent searches kept in the sidebar history
+SEARCH_HISTORY_SIZE = 50
+
+# Exact-match result cache limits (entries kept per session, lifetime)
+RESULT_CACHE_SIZE = 20
+RESULT_CACHE_TTL_SECONDS = 3600
+
+# Semantic result cache limits (entries kept per session, resume characters embedded)
+SEMANTIC_CACHE_SIZE = 20
+SEMANTIC_CACHE_MAX_CHARS = 8000
+
+# The streamed report draft is re-rendered at most this often, or sooner once
+# this many new characters have arrived
+DRAFT_RENDER_INTERVAL_SECONDS = 0.2
+DRAFT_RENDER_CHARS = 500
+
+# Largest resume upload that will be parsed
+MAX_RESUME_UPLOAD_BYTES = 10 * 1024 * 1024
+
+# Default cap on resume characters sent to the agents
+DEFAULT_MAX_RESUME_CHARS = 8000
+
+# Whitespace patterns used to normalize extracted resume text
+_INLINE_WS_RE = re.compile(r"[^\S\n]+")
+_LINE_EDGE_WS_RE = re.compile(r" ?\n ?")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+# Cap on the debug raw output so syntax highlighting stays fast
+RAW_OUTPUT_MAX_CHARS = 20000
+
+# Stylesheet injected into the page on every run
+CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "styles.css")
+
+# Title block shown at the top of the page
+PAGE_HEADER_HTML = (
+    '<p class="main-header">🔍 Multi-Agent Job Search System</p>'
+    '<p class="sub-header">Powered by CrewAI, LangChain & Google Gemini</p>'
+)
+
+# Preview label and follow-up progress message for each completed crew stage
+STAGE_PROGRESS = {
+    "jobs": ("✅ Stage 1/3 complete: Job List", "🔍 **Stage 2/3**: Profiler is analyzing your resume..."),
+    "analysis": ("✅ Stage 2/3 complete: Match Analysis", "📝 **Stage 3/3**: Writer is drafting your documents..."),
+    "documents": ("✅ Stage 3/3 complete: Final Documents", ""),
+}
+
+
+@st.cache_data(show_spinner=False)
+def _extract_pdf_text(pdf_bytes: bytes) -> str:
+    """
+    Extract text content from raw PDF bytes.
+
+    Cached on the file contents, so Streamlit reruns (and re-uploads of the
+    same resume) return the parsed text without re-opening the document.
+
+    Args:
+        pdf_bytes: Raw bytes of the PDF file
+
+    Returns:
+        Extracted text from all pages of the PDF
+    """
+    with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+        parts = []
+        for page in doc:
+            page_text = page.get_text("text")
+            if page_text:
+                parts.append(page_text)
+        return "\n".join(parts)
+
+
+def validate_pdf_upload(uploaded_file) -> str:
+    """
+    Cheap sanity checks run before any PDF parsing.
+
+    Args:
+        uploaded_file: Streamlit UploadedFile object
+
+    Returns:
+        An error message for the user, or an empty string if the file looks usable
+    """
+    if uploaded_file.size == 0:
+        return "The uploaded file is empty."
+    if uploaded_file.size > MAX_RESUME_UPLOAD_BYTES:
+        return f"Resume PDFs must be under {MAX_RESUME_UPLOAD_BYTES // (1024 * 1024)} MB."
+    if uploaded_file.getvalue()[:5] != b"%PDF-":
+        return "The uploaded file is not a valid PDF."
+    return ""
 
 
 def get_pdf_text(uploaded_file) -> str:
@@ -25,253 +123,301 @@ def get_pdf_text(uploaded_file) -> str:
     Returns:
         Extracted text from all pages of the PDF
     """
-    text = ""
-    pdf_reader = PdfReader(uploaded_file)
-    for page in pdf_reader.pages:
-        text += page.extract_text() or ""
-    return text
-
-
-class ProfessionalPDF(FPDF):
-    """Custom PDF class with professional styling."""
-
-    def __init__(self):
-        super().__init__()
-        self.set_auto_page_break(auto=True, margin=15)
-
-    def header(self):
-        """Add header to each page."""
-        self.set_font("Helvetica", "B", 10)
-        self.set_text_color(100, 100, 100)
-        self.cell(0, 10, "Job Application Report | Multi-Agent Job Search System", align="C")
-        self.ln(5)
-        self.set_draw_color(30, 136, 229)
-        self.set_line_width(0.5)
-        self.line(10, 18, 200, 18)
-        self.ln(10)
-
-    def footer(self):
-        """Add footer with page number."""
-        self.set_y(-15)
-        self.set_font("Helvetica", "I", 8)
-        self.set_text_color(128, 128, 128)
-        self.cell(0, 10, f"Page {self.page_no()}/{{nb}} | Generated on {datetime.now().strftime('%Y-%m-%d %H:%M')}", align="C")
-
-    def chapter_title(self, title: str):
-        """Add a chapter title with styling."""
-        self.set_font("Helvetica", "B", 14)
-        self.set_text_color(30, 136, 229)
-        self.cell(0, 10, title, ln=True)
-        self.set_draw_color(30, 136, 229)
-        self.set_line_width(0.3)
-        self.line(10, self.get_y(), 100, self.get_y())
-        self.ln(5)
-
-    def section_title(self, title: str):
-        """Add a section title."""
-        self.set_font("Helvetica", "B", 11)
-        self.set_text_color(50, 50, 50)
-        self.cell(0, 8, title, ln=True)
-        self.ln(2)
-
-    def body_text(self, text: str):
-        """Add body text with proper encoding."""
-        self.set_font("Helvetica", "", 10)
-        self.set_text_color(60, 60, 60)
-        # Handle encoding issues
-        clean_text = text.encode('latin-1', 'replace').decode('latin-1')
-        self.multi_cell(0, 6, clean_text)
-        self.ln(3)
-
-    def bullet_point(self, text: str):
-        """Add a bullet point."""
-        self.set_font("Helvetica", "", 10)
-        self.set_text_color(60, 60, 60)
-        clean_text = text.encode('latin-1', 'replace').decode('latin-1')
-        self.cell(5, 6, chr(149))  # Bullet character
-        self.multi_cell(0, 6, clean_text)
-
-
-def export_to_pdf(content: str, title: str = "Job Application Report") -> bytes:
+    return _extract_pdf_text(uploaded_file.getvalue())
+
+
+def normalize_resume_text(text: str, max_chars: int) -> str:
     """
-    Convert markdown content to a professional PDF.
+    Collapse PDF extraction whitespace and cap the resume length.
+
+    Runs of spaces and tabs become a single space and stacks of blank lines
+    become one, which keeps the resume's line structure while trimming the
+    padding PDF extraction leaves behind.
 
     Args:
-        content: Markdown content from the agents
-        title: Title for the PDF document
+        text: Raw text extracted from the resume PDF
+        max_chars: Maximum number of characters to keep
 
     Returns:
-        PDF file as bytes
+        Normalized resume text, at most max_chars long
+    """
+    text = _INLINE_WS_RE.sub(" ", text)
+    text = _LINE_EDGE_WS_RE.sub("\n", text)
+    text = _BLANK_LINES_RE.sub("\n\n", text)
+    return text.strip()[:max_chars]
+
+
+def _result_cache_lookup(key: tuple):
     """
-    pdf = ProfessionalPDF()
-    pdf.alias_nb_pages()
-    pdf.add_page()
+    Return the exact-match cached result for key, or None if absent or expired.
 
-    # Add main title
-    pdf.set_font("Helvetica", "B", 20)
-    pdf.set_text_color(30, 136, 229)
-    pdf.cell(0, 15, title, ln=True, align="C")
-    pdf.ln(10)
+    Keys are the topic, the resume hash and the preferences rather than the
+    full resume text or the API keys. A hit is moved to the end (most
+    recently used).
+    """
+    cache = st.session_state.result_cache
+    entry = cache.get(key)
+    if entry is None or time.time() - entry["created"] > RESULT_CACHE_TTL_SECONDS:
+        return None
+    cache.move_to_end(key)
+    return entry["result"]
+
+
+def _run_crew_cached(
+    key: tuple,
+    topic: str,
+    resume_text: str,
+    gemini_key: str,
+    serper_key: str,
+    work_type: str,
+    salary_range: str,
+    experience_level: str,
+    deep_search: bool,
+    on_stage=None,
+    on_token=None,
+) -> dict:
+    """
+    Run the crew and keep its result in the exact-match cache under key.
 
-    # Process markdown content
-    lines = content.split('\n')
-    current_section = ""
+    Results are kept in session state for an hour. The progress hooks write
+    into page elements, so the crew is deliberately not run under
+    st.cache_data: it would record those writes and fail to replay them on a
+    cache hit.
+    """
+    cache = st.session_state.result_cache
+    result = asyncio.run(_run_crew_streaming(
+        on_stage,
+        on_token,
+        topic=topic,
+        resume_text=resume_text,
+        gemini_key=gemini_key,
+        serper_key=serper_key,
+        work_type=work_type,
+        salary_range=salary_range,
+        experience_level=experience_level,
+        deep_search=deep_search,
+    ))
+    cache[key] = {"result": result, "created": time.time()}
+    cache.move_to_end(key)
+    while len(cache) > RESULT_CACHE_SIZE:
+        cache.popitem(last=False)
+    return result
+
+
+async def _run_crew_streaming(on_stage, on_token, **crew_kwargs) -> dict:
+    """
+    Run the crew asynchronously, forwarding finished stages and report tokens.
 
-    for line in lines:
-        line = line.strip()
+    create_crew_stream hands every event back on this event loop, so
+    on_stage and on_token always run on the script thread, where Streamlit
+    calls have their script context.
+    """
+    # Deferred so CrewAI and LangChain are only imported once a crew runs
+    from job_crew import create_crew_async, create_crew_stream
 
-        if not line:
-            pdf.ln(3)
-            continue
+    if on_stage is None and on_token is None:
+        return await create_crew_async(**crew_kwargs)
 
-        # Handle headers
-        if line.startswith('# '):
-            pdf.chapter_title(line[2:])
-        elif line.startswith('## '):
-            pdf.chapter_title(line[3:])
-        elif line.startswith('### '):
-            pdf.section_title(line[4:])
-        elif line.startswith('#### '):
-            pdf.section_title(line[5:])
-        # Handle bullet points
-        elif line.startswith('- ') or line.startswith('* '):
-            pdf.bullet_point(line[2:])
-        elif re.match(r'^\d+\.', line):
-            # Numbered list
-            pdf.bullet_point(line)
-        # Handle bold text (simplified)
-        elif line.startswith('**') and line.endswith('**'):
-            pdf.section_title(line.strip('*'))
-        # Handle horizontal rules
-        elif line == '---' or line == '***':
-            pdf.ln(3)
-            pdf.set_draw_color(200, 200, 200)
-            pdf.set_line_width(0.2)
-            pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-            pdf.ln(5)
-        else:
-            # Regular text - remove markdown formatting
-            clean_line = re.sub(r'\*\*(.*?)\*\*', r'\1', line)  # Bold
-            clean_line = re.sub(r'\*(.*?)\*', r'\1', clean_line)  # Italic
-            clean_line = re.sub(r'`(.*?)`', r'\1', clean_line)  # Code
-            pdf.body_text(clean_line)
+    async for event in create_crew_stream(stream_report=on_token is not None, **crew_kwargs):
+        stage, data = event["stage"], event["data"]
+        if stage == "result":
+            return data
+        if stage == "token":
+            on_token(data)
+        elif on_stage is not None:
+            on_stage(stage, data)
 
-    # Return PDF as bytes
-    return pdf.output()
 
+def _normalize_topic(topic: str) -> str:
+    """Lowercase a job title and collapse its whitespace for cache matching."""
+    return " ".join(topic.lower().split())
 
-def export_full_report_pdf(result: dict, job_topic: str) -> bytes:
+
+def _semantic_cache_key(resume_text: str) -> str:
+    """Normalize the resume into the text that gets embedded."""
+    return " ".join(resume_text.lower().split())[:SEMANTIC_CACHE_MAX_CHARS]
+
+
+def _normalize_vector(vector: list) -> list:
+    """Scale a vector to unit length so a dot product is cosine similarity."""
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def _semantic_cache_lookup(
+    topic: str, embedding: list, preferences: tuple, threshold: float, ttl_seconds: float
+):
     """
-    Export all sections as a comprehensive PDF report.
+    Find a cached result for the same job title and a semantically close resume.
 
-    Args:
-        result: Dictionary containing all crew results
-        job_topic: The job title/topic searched
+    Only entries with the same normalized topic and identical preferences are
+    compared; a few words of job title barely move an embedding dominated by
+    the resume, so similarity alone would serve one role's results for
+    another. Expired entries are evicted and a hit is moved to the back of the
+    list (most recently used).
 
     Returns:
-        PDF file as bytes
+        The cached result dictionary, or None when nothing is similar enough
     """
-    pdf = ProfessionalPDF()
-    pdf.alias_nb_pages()
-    pdf.add_page()
-
-    # Cover page
-    pdf.set_font("Helvetica", "B", 28)
-    pdf.set_text_color(30, 136, 229)
-    pdf.ln(40)
-    pdf.cell(0, 20, "Job Application Report", ln=True, align="C")
-
-    pdf.set_font("Helvetica", "", 16)
-    pdf.set_text_color(100, 100, 100)
-    pdf.cell(0, 10, f"Position: {job_topic}", ln=True, align="C")
-
-    pdf.ln(10)
-    pdf.set_font("Helvetica", "I", 12)
-    pdf.cell(0, 10, f"Generated: {datetime.now().strftime('%B %d, %Y at %H:%M')}", ln=True, align="C")
-
-    pdf.ln(30)
-    pdf.set_font("Helvetica", "", 10)
-    pdf.set_text_color(128, 128, 128)
-    pdf.multi_cell(0, 6, "This report was generated by the Multi-Agent Job Search System using AI-powered analysis of job postings and resume matching.", align="C")
-
-    # Table of Contents
-    pdf.add_page()
-    pdf.chapter_title("Table of Contents")
-    pdf.ln(5)
-    pdf.set_font("Helvetica", "", 12)
-    pdf.set_text_color(60, 60, 60)
-    sections = [
-        "1. Job Opportunities Found",
-        "2. Resume Match Analysis",
-        "3. Application Documents",
-        "4. Complete Report"
-    ]
-    for section in sections:
-        pdf.cell(0, 10, section, ln=True)
-
-    # Section 1: Jobs
-    pdf.add_page()
-    pdf.chapter_title("1. Job Opportunities Found")
-    if result.get("jobs"):
-        process_markdown_to_pdf(pdf, result["jobs"])
-
-    # Section 2: Analysis
-    pdf.add_page()
-    pdf.chapter_title("2. Resume Match Analysis")
-    if result.get("analysis"):
-        process_markdown_to_pdf(pdf, result["analysis"])
-
-    # Section 3: Documents
-    pdf.add_page()
-    pdf.chapter_title("3. Application Documents")
-    if result.get("documents"):
-        process_markdown_to_pdf(pdf, result["documents"])
-
-    # Section 4: Full Report
-    pdf.add_page()
-    pdf.chapter_title("4. Complete Report")
-    if result.get("full_report"):
-        process_markdown_to_pdf(pdf, result["full_report"])
-
-    return pdf.output()
-
-
-def process_markdown_to_pdf(pdf: ProfessionalPDF, content: str):
-    """Process markdown content and add to PDF."""
-    lines = content.split('\n')
-
-    for line in lines:
-        line = line.strip()
-
-        if not line:
-            pdf.ln(2)
+    cache = st.session_state.sem_cache
+    now = time.time()
+    cache[:] = [entry for entry in cache if now - entry["created"] <= ttl_seconds]
+
+    best_entry, best_score = None, -1.0
+    topic = _normalize_topic(topic)
+    for entry in cache:
+        if entry["topic"] != topic or entry["preferences"] != preferences:
             continue
+        score = sum(a * b for a, b in zip(embedding, entry["embedding"]))
+        if score > best_score:
+            best_entry, best_score = entry, score
+
+    if best_entry is None or best_score < threshold:
+        return None
+
+    cache.remove(best_entry)
+    cache.append(best_entry)
+    return best_entry["result"]
+
+
+def _semantic_cache_store(topic: str, embedding: list, preferences: tuple, result: dict):
+    """Add a crew result to the semantic cache, evicting the least recently used entry."""
+    cache = st.session_state.sem_cache
+    cache.append({
+        "topic": _normalize_topic(topic),
+        "embedding": embedding,
+        "preferences": preferences,
+        "result": result,
+        "created": time.time(),
+    })
+    if len(cache) > SEMANTIC_CACHE_SIZE:
+        cache.pop(0)
+
+
+def run_crew(
+    topic: str,
+    resume_text: str,
+    gemini_key: str,
+    serper_key: str,
+    work_type: str,
+    salary_range: str,
+    experience_level: str,
+    deep_search: bool,
+    similarity_threshold: float = 0.95,
+    cache_ttl_minutes: int = 60,
+    on_stage=None,
+    on_token=None,
+) -> dict:
+    """
+    Run the crew through the result caches and record whether it was a hit.
+
+    Identical inputs are served from the exact-match cache first, without
+    any API call. Otherwise near-duplicates (the same job title with the
+    resume re-exported to a new PDF or lightly edited) are served from the
+    semantic cache, and anything else gets a full crew run. on_stage
+    is called with (result_key, output) as each agent finishes on a real run,
+    and on_token with each chunk of the final report as the writer streams it.
+
+    Returns:
+        Dictionary containing structured results from each task
+    """
+    stats = st.session_state.crew_cache_stats
+    preferences = (work_type, salary_range, experience_level, deep_search)
+    key = (topic, hashlib.sha256(resume_text.encode("utf-8")).hexdigest()) + preferences
+
+    cached = _result_cache_lookup(key)
+    if cached is not None:
+        st.session_state.crew_cache_miss = False
+        stats["hits"] += 1
+        return cached
+
+    # Only embed the resume once the exact-match cache has missed
+    embedding = None
+    try:
+        embedding = _normalize_vector(embed_text(_semantic_cache_key(resume_text), gemini_key))
+    except Exception as e:
+        logger.warning(f"Semantic cache unavailable, embedding failed: {e}")
+
+    if embedding is not None:
+        cached = _semantic_cache_lookup(topic, embedding, preferences, similarity_threshold, cache_ttl_minutes * 60)
+        if cached is not None:
+            st.session_state.crew_cache_miss = False
+            stats["hits"] += 1
+            return cached
+
+    st.session_state.crew_cache_miss = True
+    result = _run_crew_cached(
+        key,
+        topic,
+        resume_text,
+        gemini_key,
+        serper_key,
+        work_type,
+        salary_range,
+        experience_level,
+        deep_search,
+        on_stage=on_stage,
+        on_token=on_token,
+    )
+    stats["misses"] += 1
+
+    if embedding is not None:
+        _semantic_cache_store(topic, embedding, preferences, result)
+    return result
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def section_pdf_bytes(content: str, title: str, generated_at: float) -> bytes:
+    """
+    Render one report section to PDF bytes, cached on content, title and time.
+
+    Reruns and identical sections share a single immutable payload instead of
+    re-rendering and re-allocating it for every download button. The PDF is
+    stamped with generated_at (the result's creation time) rather than the
+    render time, so the cached bytes never show a stale "Generated on".
+    """
+    return bytes(export_to_pdf(content, title, datetime.fromtimestamp(generated_at)))
 
-        if line.startswith('# '):
-            pdf.section_title(line[2:])
-        elif line.startswith('## '):
-            pdf.section_title(line[3:])
-        elif line.startswith('### '):
-            pdf.section_title(line[4:])
-        elif line.startswith('- ') or line.startswith('* '):
-            pdf.bullet_point(line[2:])
-        elif re.match(r'^\d+\.', line):
-            pdf.bullet_point(line)
-        elif line == '---' or line == '***':
-            pdf.ln(2)
-            pdf.set_draw_color(200, 200, 200)
-            pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-            pdf.ln(3)
-        else:
-            clean_line = re.sub(r'\*\*(.*?)\*\*', r'\1', line)
-            clean_line = re.sub(r'\*(.*?)\*', r'\1', clean_line)
-            clean_line = re.sub(r'`(.*?)`', r'\1', clean_line)
-            pdf.body_text(clean_line)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def full_report_pdf_bytes(
+    jobs: str, analysis: str, documents: str, full_report: str, job_topic: str, generated_at: float
+) -> bytes:
+    """
+    Render the all-in-one PDF package, cached on the four section strings.
+
+    Only the sections and the result's creation time are passed in so the
+    cache key stays small and hashable rather than hashing the whole result
+    dict (raw output included).
+    """
+    sections = {
+        "jobs": jobs,
+        "analysis": analysis,
+        "documents": documents,
+        "full_report": full_report,
+    }
+    return bytes(export_full_report_pdf(sections, job_topic, datetime.fromtimestamp(generated_at)))
+
+
+@st.cache_data(show_spinner=False)
+def load_css() -> str:
+    """Read the app stylesheet once; later reruns reuse the cached string."""
+    with open(CSS_PATH, encoding="utf-8") as css_file:
+        return css_file.read()
+
+
+@st.cache_data(show_spinner=False)
+def page_head_html() -> str:
+    """Build the stylesheet and page header once, for a single markdown element."""
+    return f"<style>{load_css()}</style>{PAGE_HEADER_HTML}"
 
 
 # Load environment variables
 load_dotenv()
 
+# Full tracebacks are only rendered in the UI when DEBUG=1
+DEBUG = os.getenv("DEBUG") == "1"
+
 # Page configuration
 st.set_page_config(
     page_title="Multi-Agent Job Search System",
@@ -286,78 +432,24 @@ if "crew_result" not in st.session_state:
 if "job_topic_saved" not in st.session_state:
     st.session_state.job_topic_saved = ""
 if "search_history" not in st.session_state:
-    st.session_state.search_history = []
+    st.session_state.search_history = deque(maxlen=SEARCH_HISTORY_SIZE)
 if "selected_history_index" not in st.session_state:
     st.session_state.selected_history_index = None
-
-# Custom CSS for better styling
-st.markdown("""
-    <style>
-    .main-header {
-        font-size: 2.5rem;
-        font-weight: bold;
-        color: #1E88E5;
-        text-align: center;
-        margin-bottom: 1rem;
-    }
-    .sub-header {
-        font-size: 1.2rem;
-        color: #666;
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .stButton>button {
-        width: 100%;
-        background-color: #1E88E5;
-        color: white;
-        font-weight: bold;
-        padding: 0.75rem;
-        border-radius: 0.5rem;
-    }
-    .stButton>button:hover {
-        background-color: #1565C0;
-    }
-    .success-box {
-        padding: 1rem;
-        border-radius: 0.5rem;
-        background-color: #E8F5E9;
-        border: 1px solid #4CAF50;
-    }
-    .metric-card {
-        background-color: #f8f9fa;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        border-left: 4px solid #1E88E5;
-        margin-bottom: 1rem;
-    }
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 8px;
-    }
-    .stTabs [data-baseweb="tab"] {
-        padding: 10px 20px;
-        background-color: #f0f2f6;
-        border-radius: 4px 4px 0 0;
-    }
-    .stTabs [aria-selected="true"] {
-        background-color: #1E88E5;
-        color: white;
-    }
-    .history-item {
-        padding: 0.5rem;
-        margin: 0.25rem 0;
-        border-radius: 0.25rem;
-        background-color: #f0f2f6;
-        cursor: pointer;
-    }
-    .history-item:hover {
-        background-color: #e0e2e6;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-# Header
-st.markdown('<p class="main-header">🔍 Multi-Agent Job Search System</p>', unsafe_allow_html=True)
-st.markdown('<p class="sub-header">Powered by CrewAI, LangChain & Google Gemini</p>', unsafe_allow_html=True)
+if "resume_text" not in st.session_state:
+    st.session_state.resume_text = ""
+if "resume_file_id" not in st.session_state:
+    st.session_state.resume_file_id = None
+if "raw_output_cache" not in st.session_state:
+    st.session_state.raw_output_cache = (None, "")
+if "crew_cache_stats" not in st.session_state:
+    st.session_state.crew_cache_stats = {"hits": 0, "misses": 0}
+if "sem_cache" not in st.session_state:
+    st.session_state.sem_cache = []
+if "result_cache" not in st.session_state:
+    st.session_state.result_cache = OrderedDict()
+
+# Custom CSS and header
+st.markdown(page_head_html(), unsafe_allow_html=True)
 
 # Sidebar
 with st.sidebar:
@@ -449,6 +541,37 @@ with st.sidebar:
             "Enable Deep mode for comprehensive analysis."
         )
 
+    max_resume_chars = st.slider(
+        "Max Resume Length (characters)",
+        min_value=2000,
+        max_value=20000,
+        value=DEFAULT_MAX_RESUME_CHARS,
+        step=1000,
+        help="Longer resumes are truncated before analysis to keep prompts fast and cheap",
+    )
+
+    st.markdown("---")
+
+    # Result Cache Section
+    st.subheader("🧠 Result Cache")
+
+    similarity_threshold = st.slider(
+        "Similarity Threshold",
+        min_value=0.80,
+        max_value=1.00,
+        value=0.95,
+        step=0.01,
+        help="Reuse a previous result for the same job title when the resume is at least this similar",
+    )
+
+    cache_ttl_minutes = st.number_input(
+        "Cache Lifetime (minutes)",
+        min_value=1,
+        max_value=1440,
+        value=60,
+        help="How long similar-input results stay reusable",
+    )
+
     st.markdown("---")
 
     # Search History Section
@@ -457,19 +580,19 @@ with st.sidebar:
     if st.session_state.search_history:
         st.caption(f"{len(st.session_state.search_history)} previous search(es)")
 
-        for idx, history_item in enumerate(reversed(st.session_state.search_history)):
-            actual_idx = len(st.session_state.search_history) - 1 - idx
+        # History is stored newest first, so it renders without reversing
+        for idx, history_item in enumerate(st.session_state.search_history):
             timestamp = history_item.get("timestamp", "")
             topic = history_item.get("topic", "Unknown")
 
             # Create a button for each history item
             if st.button(
                 f"🔹 {topic[:25]}{'...' if len(topic) > 25 else ''}",
-                key=f"history_{actual_idx}",
+                key=f"history_{idx}",
                 help=f"Searched on {timestamp}\nClick to view results",
                 use_container_width=True,
             ):
-                st.session_state.selected_history_index = actual_idx
+                st.session_state.selected_history_index = idx
                 st.session_state.crew_result = history_item.get("result")
                 st.session_state.job_topic_saved = topic
                 st.toast(f"📂 Loaded: {topic}", icon="✅")
@@ -479,7 +602,7 @@ with st.sidebar:
 
         # Clear History Button
         if st.button("🗑️ Clear History", type="secondary", use_container_width=True):
-            st.session_state.search_history = []
+            st.session_state.search_history.clear()
             st.session_state.selected_history_index = None
             st.session_state.crew_result = None
             st.session_state.job_topic_saved = ""
@@ -518,26 +641,38 @@ with st.sidebar:
 col1, col2 = st.columns([1, 1])
 
 with col1:
-    st.subheader("🎯 Job Search Details")
+    # Inputs are batched in a form so typing and uploading only rerun the
+    # script once, when the crew is kicked off
+    with st.form("kickoff_form"):
+        st.subheader("🎯 Job Search Details")
+
+        job_topic = st.text_input(
+            "Job Title / Topic",
+            placeholder="e.g., Senior Python Developer, Data Scientist, Product Manager",
+            help="Enter the job title or role you're looking for",
+        )
 
-    job_topic = st.text_input(
-        "Job Title / Topic",
-        placeholder="e.g., Senior Python Developer, Data Scientist, Product Manager",
-        help="Enter the job title or role you're looking for",
-    )
+        st.subheader("📄 Your Resume")
 
-    st.subheader("📄 Your Resume")
+        uploaded_file = st.file_uploader(
+            "Upload your resume (PDF)",
+            type=["pdf"],
+            help="Upload your resume in PDF format for analysis",
+        )
 
-    uploaded_file = st.file_uploader(
-        "Upload your resume (PDF)",
-        type=["pdf"],
-        help="Upload your resume in PDF format for analysis",
-    )
+        kickoff_submitted = st.form_submit_button("🔥 Kickoff Crew", type="primary")
 
     # Extract text from PDF and show confirmation
     resume_text = ""
-    if uploaded_file is not None:
-        resume_text = get_pdf_text(uploaded_file)
+    upload_error = validate_pdf_upload(uploaded_file) if uploaded_file is not None else ""
+    if upload_error:
+        st.error(f"❌ {upload_error}")
+    elif uploaded_file is not None:
+        # Only extract when a different file is uploaded; other reruns reuse the text
+        if st.session_state.resume_file_id != uploaded_file.file_id:
+            st.session_state.resume_text = get_pdf_text(uploaded_file)
+            st.session_state.resume_file_id = uploaded_file.file_id
+        resume_text = st.session_state.resume_text
         st.success(f"✅ Resume Loaded: {uploaded_file.name}")
         with st.expander("Preview extracted text"):
             st.text(resume_text[:2000] + "..." if len(resume_text) > 2000 else resume_text)
@@ -557,12 +692,17 @@ with col1:
 with col2:
     st.subheader("🚀 Results")
 
+    # Show how many kickoffs were served from the crew result cache
+    cache_stats = st.session_state.crew_cache_stats
+    if cache_stats["hits"]:
+        st.caption(f"⚡ Crew cache: {cache_stats['hits']} hit(s), {cache_stats['misses']} miss(es) this session")
+
     # Show if viewing from history
     if st.session_state.selected_history_index is not None:
         st.info(f"📂 Viewing saved search: **{st.session_state.job_topic_saved}**")
 
-    # Kickoff button
-    if st.button("🔥 Kickoff Crew", type="primary"):
+    # Kickoff form submission
+    if kickoff_submitted:
         # Validation
         if not gemini_api_key:
             st.error("❌ Please enter your Google Gemini API Key in the sidebar.")
@@ -573,6 +713,8 @@ with col2:
         elif not resume_text:
             st.error("❌ Please upload your resume PDF.")
         else:
+            resume_text = normalize_resume_text(resume_text, max_resume_chars)
+
             # Run the crew
             with st.spinner("🤖 Agents are working... This may take a few minutes."):
                 try:
@@ -587,7 +729,41 @@ with col2:
                     else:
                         progress_placeholder.info("🔍 **Stage 1/3**: Researcher is searching for jobs...")
 
-                    result = create_crew(
+                    # Completed stages are previewed here while later agents keep working
+                    stage_placeholder = st.empty()
+                    stage_container = stage_placeholder.container()
+
+                    # The writer's report is shown as it streams, then replaced by its stage preview
+                    draft_placeholder = st.empty()
+                    draft_chunks = []
+                    # Characters received since the last render and when it happened
+                    draft_state = {"pending": 0, "rendered_at": 0.0}
+
+                    def show_stage(key: str, output: str):
+                        label, next_message = STAGE_PROGRESS[key]
+                        if next_message:
+                            progress_placeholder.info(next_message)
+                        if key == "documents":
+                            # The finished documents replace the draft in full
+                            draft_placeholder.empty()
+                        with stage_container.expander(label):
+                            st.markdown(output)
+
+                    def show_token(text: str):
+                        # Re-rendering the whole draft per chunk is quadratic, so
+                        # chunks are batched by time and size
+                        draft_chunks.append(text)
+                        draft_state["pending"] += len(text)
+                        now = time.monotonic()
+                        if (now - draft_state["rendered_at"] < DRAFT_RENDER_INTERVAL_SECONDS
+                                and draft_state["pending"] < DRAFT_RENDER_CHARS):
+                            return
+                        draft = "".join(draft_chunks)
+                        draft_chunks[:] = [draft]
+                        draft_placeholder.markdown(draft)
+                        draft_state.update(pending=0, rendered_at=now)
+
+                    result = run_crew(
                         topic=job_topic,
                         resume_text=resume_text,
                         gemini_key=gemini_api_key,
@@ -596,6 +772,10 @@ with col2:
                         salary_range=salary_range,
                         experience_level=experience_level,
                         deep_search=deep_search,
+                        similarity_threshold=similarity_threshold,
+                        cache_ttl_minutes=cache_ttl_minutes,
+                        on_stage=show_stage,
+                        on_token=show_token,
                     )
 
                     st.session_state.crew_result = result
@@ -612,15 +792,22 @@ with col2:
                         "deep_search": deep_search,
                         "result": result,
                     }
-                    st.session_state.search_history.append(history_entry)
+                    st.session_state.search_history.appendleft(history_entry)
 
                     progress_placeholder.empty()
-                    st.success("✅ All agents completed successfully!")
-                    st.toast("Search complete! Results ready.", icon="🎉")
+                    stage_placeholder.empty()
+                    if st.session_state.crew_cache_miss:
+                        st.success("✅ All agents completed successfully!")
+                        st.toast("Search complete! Results ready.", icon="🎉")
+                    else:
+                        st.success("⚡ Loaded cached results for matching inputs - no agents re-run.")
+                        st.toast("Cached results loaded!", icon="⚡")
 
                 except Exception as e:
                     st.error(f"❌ An error occurred: {str(e)}")
-                    st.exception(e)
+                    logger.exception("Crew run failed")
+                    if DEBUG:
+                        st.exception(e)
 
     # Display results in tabs
     if st.session_state.crew_result:
@@ -635,6 +822,9 @@ with col2:
         ])
 
         result = st.session_state.crew_result
+        safe_topic = st.session_state.job_topic_saved.replace(' ', '_')
+        # Results from before creation times were recorded are stamped with now
+        generated_at = result.get("generated_at") or time.time()
 
         with tab1:
             st.subheader("Job Opportunities Found")
@@ -647,11 +837,10 @@ with col2:
 
             # PDF Download for Jobs
             if result.get("jobs"):
-                pdf_bytes = export_to_pdf(result["jobs"], f"Job List - {st.session_state.job_topic_saved}")
                 st.download_button(
                     label="📥 Download Job List (PDF)",
-                    data=pdf_bytes,
-                    file_name=f"job_list_{st.session_state.job_topic_saved.replace(' ', '_')}.pdf",
+                    data=partial(section_pdf_bytes, result["jobs"], f"Job List - {st.session_state.job_topic_saved}", generated_at),
+                    file_name=f"job_list_{safe_topic}.pdf",
                     mime="application/pdf",
                     key="download_jobs_pdf",
                     on_click=lambda: st.toast("PDF ready for download!", icon="📄"),
@@ -668,11 +857,10 @@ with col2:
 
             # PDF Download for Analysis
             if result.get("analysis"):
-                pdf_bytes = export_to_pdf(result["analysis"], f"Match Analysis - {st.session_state.job_topic_saved}")
                 st.download_button(
                     label="📥 Download Analysis (PDF)",
-                    data=pdf_bytes,
-                    file_name=f"match_analysis_{st.session_state.job_topic_saved.replace(' ', '_')}.pdf",
+                    data=partial(section_pdf_bytes, result["analysis"], f"Match Analysis - {st.session_state.job_topic_saved}", generated_at),
+                    file_name=f"match_analysis_{safe_topic}.pdf",
                     mime="application/pdf",
                     key="download_analysis_pdf",
                     on_click=lambda: st.toast("PDF ready for download!", icon="📄"),
@@ -689,11 +877,10 @@ with col2:
 
             # PDF Download for Documents
             if result.get("documents"):
-                pdf_bytes = export_to_pdf(result["documents"], f"Application Documents - {st.session_state.job_topic_saved}")
                 st.download_button(
                     label="📥 Download Documents (PDF)",
-                    data=pdf_bytes,
-                    file_name=f"application_docs_{st.session_state.job_topic_saved.replace(' ', '_')}.pdf",
+                    data=partial(section_pdf_bytes, result["documents"], f"Application Documents - {st.session_state.job_topic_saved}", generated_at),
+                    file_name=f"application_docs_{safe_topic}.pdf",
                     mime="application/pdf",
                     key="download_docs_pdf",
                     on_click=lambda: st.toast("PDF ready for download!", icon="📄"),
@@ -714,11 +901,10 @@ with col2:
 
             with col_pdf1:
                 if result.get("full_report"):
-                    pdf_bytes = export_to_pdf(result["full_report"], f"Complete Report - {st.session_state.job_topic_saved}")
                     st.download_button(
                         label="📥 Download Report (PDF)",
-                        data=pdf_bytes,
-                        file_name=f"full_report_{st.session_state.job_topic_saved.replace(' ', '_')}.pdf",
+                        data=partial(section_pdf_bytes, result["full_report"], f"Complete Report - {st.session_state.job_topic_saved}", generated_at),
+                        file_name=f"full_report_{safe_topic}.pdf",
                         mime="application/pdf",
                         key="download_full_pdf",
                         on_click=lambda: st.toast("PDF ready for download!", icon="📄"),
@@ -726,19 +912,33 @@ with col2:
 
             with col_pdf2:
                 # Comprehensive PDF with all sections
-                pdf_bytes = export_full_report_pdf(result, st.session_state.job_topic_saved)
                 st.download_button(
                     label="📥 Download All-in-One PDF",
-                    data=pdf_bytes,
-                    file_name=f"complete_package_{st.session_state.job_topic_saved.replace(' ', '_')}.pdf",
+                    data=partial(
+                        full_report_pdf_bytes,
+                        result.get("jobs", ""),
+                        result.get("analysis", ""),
+                        result.get("documents", ""),
+                        result.get("full_report", ""),
+                        st.session_state.job_topic_saved,
+                        generated_at,
+                    ),
+                    file_name=f"complete_package_{safe_topic}.pdf",
                     mime="application/pdf",
                     key="download_complete_pdf",
                     on_click=lambda: st.toast("Complete PDF package ready!", icon="📦"),
                 )
 
-        # Raw output option
-        with st.expander("🔧 View Raw Output (Debug)"):
-            st.code(str(result), language="python")
+        # Raw output option - only serialized when the user opts in, and
+        # only once per result
+        if st.toggle("🔧 View Raw Output (Debug)", value=False):
+            cached_source, cached_text = st.session_state.raw_output_cache
+            if cached_source is not result:
+                cached_text = json.dumps(result, default=str, indent=2)
+                if len(cached_text) > RAW_OUTPUT_MAX_CHARS:
+                    cached_text = cached_text[:RAW_OUTPUT_MAX_CHARS] + "\n... (truncated)"
+                st.session_state.raw_output_cache = (result, cached_text)
+            st.code(cached_text, language="json")
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,46 @@
+"""
+Text embedding helper for the Multi-Agent Job Search System.
+Kept separate from job_crew so similarity lookups don't import CrewAI.
+"""
+
+from functools import lru_cache
+
+
+@lru_cache(maxsize=8)
+def _get_embeddings(gemini_key: str):
+    """Return the Gemini embeddings client for an API key, reused across calls."""
+    # Deferred so the LangChain provider stack is only imported when embedding
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return GoogleGenerativeAIEmbeddings(
+        model="models/text-embedding-004",
+        google_api_key=gemini_key,
+    )
+
+
+def embed_text(text: str, gemini_key: str) -> list:
+    """
+    Embed text with Gemini's embedding model for similarity lookups.
+
+    Args:
+        text: The text to embed
+        gemini_key: Google Gemini API key
+
+    Returns:
+        Embedding vector as a list of floats
+    """
+    return _get_embeddings(gemini_key).embed_query(text)
+
+
+def embed_texts(texts: list, gemini_key: str) -> list:
+    """
+    Embed several texts in a single batched request.
+
+    Args:
+        texts: The texts to embed
+        gemini_key: Google Gemini API key
+
+    Returns:
+        One embedding vector per text, in order
+    """
+    return _get_embeddings(gemini_key).embed_documents(texts)
@@ -5,138 +5,80 @@ Includes deep scraping capabilities for extracting full job posting content.
 """
 
 import os
+import asyncio
+import atexit
+import hashlib
+import json
 import logging
-from crewai import Agent, Task, Crew, Process
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple, Type
+import requests
+from urllib3.util.retry import Retry
+from pydantic import BaseModel, Field
+from crewai import Agent, Task, Crew, Process, LLM
+from crewai.tools import BaseTool
 from crewai_tools import SerperDevTool, ScrapeWebsiteTool
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+from embeddings import embed_text, embed_texts
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# CrewAI's own info-level chatter is only useful when debugging
+logging.getLogger("crewai").setLevel(logging.WARNING)
 
+# Verbose agent and crew output prints every prompt and response to stdout,
+# so it is off unless JOBCREW_DEBUG=1 (or verbose=True is passed explicitly)
+VERBOSE = os.getenv("JOBCREW_DEBUG") == "1"
 
-class SafeScrapeWebsiteTool(ScrapeWebsiteTool):
-    """
-    A wrapper around ScrapeWebsiteTool with built-in error handling.
-    Gracefully handles blocked websites and returns fallback data.
-    """
-
-    def _run(self, website_url: str) -> str:
-        """
-        Scrape website with error handling for blocked/failed requests.
-
-        Args:
-            website_url: The URL to scrape
-
-        Returns:
-            Scraped content or fallback message
-        """
-        try:
-            logger.info(f"Attempting to scrape: {website_url}")
-            result = super()._run(website_url)
-
-            if result and len(result) > 100:
-                logger.info(f"Successfully scraped {len(result)} characters from {website_url}")
-                return result
-            else:
-                logger.warning(f"Minimal content returned from {website_url}")
-                return self._fallback_message(website_url, "minimal content")
-
-        except Exception as e:
-            error_msg = str(e).lower()
-            logger.error(f"Scraping failed for {website_url}: {e}")
-
-            # Handle specific error types
-            if "403" in error_msg or "forbidden" in error_msg:
-                return self._fallback_message(website_url, "access forbidden (403)")
-            elif "404" in error_msg or "not found" in error_msg:
-                return self._fallback_message(website_url, "page not found (404)")
-            elif "timeout" in error_msg:
-                return self._fallback_message(website_url, "connection timeout")
-            elif "ssl" in error_msg or "certificate" in error_msg:
-                return self._fallback_message(website_url, "SSL certificate error")
-            else:
-                return self._fallback_message(website_url, f"error: {str(e)[:100]}")
-
-    def _fallback_message(self, url: str, reason: str) -> str:
-        """Generate a fallback message when scraping fails."""
-        return f"""
-[SCRAPING NOTICE]
-URL: {url}
-Status: Could not fully scrape this page ({reason})
-Action: Using search snippet data instead. Continue analysis with available information.
-
-Note: Some job boards block automated access. The search results still contain
-valuable information about this position. Proceed with the analysis using the
-job title, company name, and requirements from the search snippets.
-"""
-
-
-def create_crew(
-    topic: str,
-    resume_text: str,
-    gemini_key: str,
-    serper_key: str,
-    work_type: str = "Any",
-    salary_range: str = "Not specified",
-    experience_level: str = "Any",
-    deep_search: bool = False,
-) -> dict:
-    """
-    Create and run a CrewAI crew for job searching and resume optimization.
-
-    Args:
-        topic: Job title or search topic (e.g., "Senior Python Developer")
-        resume_text: The user's resume content
-        gemini_key: Google Gemini API key
-        serper_key: Serper API key for web search
-        work_type: Preferred work arrangement (Remote/Hybrid/On-site/Any)
-        salary_range: Expected salary range
-        experience_level: Experience level (Entry/Mid/Senior/Any)
-        deep_search: Enable deep scraping of job posting URLs for detailed analysis
-
-    Returns:
-        Dictionary containing structured results from each task
-    """
-    # Set environment variables for the tools
-    os.environ["GOOGLE_API_KEY"] = gemini_key
-    os.environ["SERPER_API_KEY"] = serper_key
-
-    # Initialize the LLM
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-1.5-pro",
-        google_api_key=gemini_key,
-        temperature=0.7,
-    )
+# ========== PROMPT CONSTANTS ==========
+# Static agent personas and output formats, built once at import
 
-    # Initialize tools
-    search_tool = SerperDevTool()
+# Job search task instructions; specialized per search mode in
+# SEARCH_TASK_TEMPLATES below
+SEARCH_TASK_TEMPLATE = """Search for the latest job opportunities for the target role given in
+        the Input section below.
+        {deep_search_instructions}
 
-    # Configure tools based on search depth
-    researcher_tools = [search_tool]
+        Your task:
+        1. Search for current job openings for the target role
+        2. Filter for the preferred work type when possible
+        3. Find at least 5-7 relevant job postings
+        4. For each job, extract:
+           - Job title (exact title from posting)
+           - Company name
+           - Location and work arrangement (Remote/Hybrid/On-site)
+           - Key requirements and qualifications (list ALL mentioned skills)
+           - Required years of experience
+           - Salary range (if available)
+           - Application URL or platform{deep_search_fields}
+        5. Identify the TOP 3 most promising opportunities based on candidate preferences
+        6. List ALL unique technical skills and tools mentioned across all postings
 
-    if deep_search:
-        # Add scraping tool for deep search mode
-        scrape_tool = SafeScrapeWebsiteTool()
-        researcher_tools.append(scrape_tool)
-        logger.info("Deep search enabled: Scraping tool activated")
+        Focus on jobs from reputable companies. Prioritize positions matching the
+        candidate's work type preference.
 
-    # Build preferences string for search context
-    preferences = f"""
-    Candidate Preferences:
-    - Work Type: {work_type}
-    - Salary Range: {salary_range}
-    - Experience Level: {experience_level}
-    """
+        Input:
+        Target role: {topic}
+        Candidate Preferences:
+        - Work Type: {work_type}
+        - Salary Range: {salary_range}
+        - Experience Level: {experience_level}"""
 
-    # Deep search instructions
-    deep_search_instructions = ""
-    if deep_search:
-        deep_search_instructions = """
+# Extra search instructions when the researcher can scrape job postings
+DEEP_SEARCH_INSTRUCTIONS = """
 
     DEEP SEARCH MODE ENABLED:
-    You have access to the ScrapeWebsiteTool. For each promising job posting:
-    1. Use the scrape tool to visit the actual job posting URL
+    You have access to the ScrapeWebsiteTool and the batch scraping tool. For each promising job posting:
+    1. Visit the actual job posting URL. When you have 2 or more URLs to read,
+       call the batch tool ONCE with the full list instead of scraping them one by one
     2. Extract the FULL job description including:
        - Complete list of required skills and technologies
        - Company culture and values
@@ -154,10 +96,48 @@ def create_crew(
     - Continue with available data and note which sources were limited
     """
 
-    # ========== DEFINE AGENTS ==========
+# Extra per-job fields the researcher extracts in deep search mode
+DEEP_SEARCH_FIELDS = """
+           - FULL JOB DESCRIPTION (from scraped content)
+           - Company culture and values (if available)
+           - Tech stack details (specific versions, frameworks)
+           - Team information and growth opportunities
+           - Benefits and perks mentioned"""
 
-    # Agent 1: Job Researcher (Enhanced with scraping capabilities)
-    researcher_backstory = """You are an expert job market researcher with 15+ years of experience
+# Expected output for the job search task. The researcher answers in compact
+# JSON (validated against JobSearchReport) instead of verbose Markdown, which
+# roughly halves its output tokens; _jobs_markdown renders it for display.
+JOBS_OUTPUT = """A JSON object with these fields and nothing else:
+- jobs: 5-7 entries, each with title, company, location (City/Remote/Hybrid),
+  requirements (list of key requirements), skills (list), experience
+  (e.g. "5+ years"), salary (range if available, else empty) and url
+- top_recommendations: exactly 3 entries with job ("Title at Company") and
+  reason (why it's a good fit)
+- skills_in_demand: technical, soft, tools and certifications, each a list
+  aggregated across all postings"""
+
+# Extra JSON fields requested from the researcher in deep search mode
+DEEP_JOBS_OUTPUT = """
+- per job, also: full_description (summary of the scraped content),
+  company_culture, tech_stack (technologies with versions if available) and
+  scrape_status ("Success" or "Fallback to snippet")
+- deep_search_insights: hidden_requirements (list), company_values (list) and
+  scraping_summary ("X/Y sites successfully scraped")"""
+
+# Search task prompt and expected output for each value of the deep search
+# flag. The deep search text is spliced in once here, leaving only the
+# per-run inputs for str.format_map.
+SEARCH_TASK_TEMPLATES = {
+    deep: SEARCH_TASK_TEMPLATE
+        .replace("{deep_search_instructions}", DEEP_SEARCH_INSTRUCTIONS if deep else "")
+        .replace("{deep_search_fields}", DEEP_SEARCH_FIELDS if deep else "")
+    for deep in (False, True)
+}
+EXPECTED_OUTPUT_JOBS = {False: JOBS_OUTPUT, True: JOBS_OUTPUT + DEEP_JOBS_OUTPUT}
+
+# Researcher agent persona. The deep search variant is assembled here once
+# so each mode always sends the same system prompt prefix.
+RESEARCHER_BACKSTORY = """You are an expert job market researcher with 15+ years of experience
         in talent acquisition and job market analysis. You have deep connections across
         LinkedIn, Indeed, Glassdoor, and niche job boards. You specialize in identifying
         both well-known opportunities at top companies and hidden gems at growing startups.
@@ -165,8 +145,7 @@ def create_crew(
         legitimate and worthwhile. You always verify job details and prioritize positions
         that match the candidate's stated preferences for work arrangement and compensation."""
 
-    if deep_search:
-        researcher_backstory += """
+DEEP_RESEARCHER_BACKSTORY = RESEARCHER_BACKSTORY + """
 
         ADVANCED CAPABILITY: You are equipped with web scraping tools that allow you to
         read the FULL content of job posting pages. This gives you access to:
@@ -176,25 +155,12 @@ def create_crew(
         - Detailed tech stack specifications
         - Benefits and compensation details
 
-        When you find a relevant job URL, use your scraping tool to extract the complete
-        posting. If a site blocks access, gracefully fall back to using search data."""
+        When you find relevant job URLs, use your scraping tools to extract the complete
+        postings, reading several URLs in one batch call where you can. If a site blocks
+        access, gracefully fall back to using search data."""
 
-    researcher = Agent(
-        role="Senior Job Market Researcher" + (" & Web Intelligence Specialist" if deep_search else ""),
-        goal=f"Find the best {work_type.lower()} job opportunities for {topic} positions matching candidate preferences"
-             + (" and extract full job details using web scraping" if deep_search else ""),
-        backstory=researcher_backstory,
-        tools=researcher_tools,
-        llm=llm,
-        verbose=True,
-        allow_delegation=False,
-    )
-
-    # Agent 2: Resume Profiler (Enhanced as Technical Recruiter)
-    profiler = Agent(
-        role="Senior Technical Recruiter & ATS Expert",
-        goal="Perform deep keyword analysis between resume and job requirements to maximize ATS compatibility",
-        backstory="""You are a Senior Technical Recruiter with 12+ years of experience at
+# Profiler agent persona
+PROFILER_BACKSTORY = """You are a Senior Technical Recruiter with 12+ years of experience at
         Fortune 500 companies and top tech firms (Google, Amazon, Microsoft). You have
         personally reviewed over 50,000 resumes and understand exactly how Applicant
         Tracking Systems (ATS) work. Your expertise lies in:
@@ -216,17 +182,10 @@ def create_crew(
 
         IMPORTANT: When analyzing job requirements, use ALL available information including
         any scraped full job descriptions provided by the Researcher. The more detailed
-        the job posting data, the more precise your keyword analysis will be.""",
-        llm=llm,
-        verbose=True,
-        allow_delegation=False,
-    )
+        the job posting data, the more precise your keyword analysis will be."""
 
-    # Agent 3: Content Writer (Enhanced for structured output)
-    writer = Agent(
-        role="Executive Career Content Strategist",
-        goal="Create a comprehensive, professionally formatted Job Application Report",
-        backstory="""You are an Executive Career Content Strategist who has helped
+# Writer agent persona
+WRITER_BACKSTORY = """You are an Executive Career Content Strategist who has helped
         C-level executives, senior engineers, and professionals at all levels land
         positions at top companies. You've written content that has secured offers
         at FAANG companies, Fortune 500 corporations, and high-growth startups.
@@ -242,131 +201,31 @@ def create_crew(
 
         IMPORTANT: Leverage ALL job details provided, including scraped content with
         company culture, values, and specific requirements. Tailor cover letters to
-        mention specific details that show you've researched the company thoroughly.""",
-        llm=llm,
-        verbose=True,
-        allow_delegation=False,
-    )
-
-    # ========== DEFINE TASKS ==========
-
-    # Task 1: Search for Jobs (Enhanced with deep search capabilities)
-    search_task_description = f"""Search for the latest job opportunities related to: {topic}
-
-        {preferences}
-        {deep_search_instructions}
-
-        Your task:
-        1. Search for current job openings for {topic} positions
-        2. Filter for {work_type} positions when possible
-        3. Find at least 5-7 relevant job postings
-        4. For each job, extract:
-           - Job title (exact title from posting)
-           - Company name
-           - Location and work arrangement (Remote/Hybrid/On-site)
-           - Key requirements and qualifications (list ALL mentioned skills)
-           - Required years of experience
-           - Salary range (if available)
-           - Application URL or platform"""
-
-    if deep_search:
-        search_task_description += """
-           - FULL JOB DESCRIPTION (from scraped content)
-           - Company culture and values (if available)
-           - Tech stack details (specific versions, frameworks)
-           - Team information and growth opportunities
-           - Benefits and perks mentioned"""
-
-    search_task_description += f"""
-        5. Identify the TOP 3 most promising opportunities based on candidate preferences
-        6. List ALL unique technical skills and tools mentioned across all postings
-
-        Focus on jobs from reputable companies. Prioritize positions matching the
-        candidate's work type preference: {work_type}."""
-
-    expected_output_jobs = """A structured job search report in this EXACT format:
+        mention specific details that show you've researched the company thoroughly."""
 
-## Job Opportunities Found
-
-### Job 1: [Title] at [Company]
-- **Location**: [City/Remote/Hybrid]
-- **Requirements**: [Bullet list of key requirements]
-- **Skills Needed**: [Comma-separated list]
-- **Experience**: [X years]
-- **Salary**: [Range if available]
-- **URL**: [Job posting URL]"""
-
-    if deep_search:
-        expected_output_jobs += """
-- **Full Description**: [Scraped content summary - key details]
-- **Company Culture**: [Values, work environment details]
-- **Tech Stack**: [Detailed technologies with versions if available]
-- **Scrape Status**: [Success/Fallback to snippet]"""
-
-    expected_output_jobs += """
-
-[Repeat for all 5-7 jobs]
-
-## Top 3 Recommended Positions
-1. [Job Title at Company] - [Why it's a good fit]
-2. [Job Title at Company] - [Why it's a good fit]
-3. [Job Title at Company] - [Why it's a good fit]
-
-## Skills in Demand (Aggregated)
-- Technical Skills: [List]
-- Soft Skills: [List]
-- Tools/Platforms: [List]
-- Certifications: [List if any]"""
-
-    if deep_search:
-        expected_output_jobs += """
-
-## Deep Search Insights
-- **Hidden Requirements Found**: [Skills only visible in full descriptions]
-- **Common Company Values**: [Culture themes across postings]
-- **Scraping Summary**: [X/Y sites successfully scraped]"""
-
-    search_task = Task(
-        description=search_task_description,
-        expected_output=expected_output_jobs,
-        agent=researcher,
-    )
-
-    # Task 2: Analyze Resume with Keyword Gap Analysis
-    analyze_task = Task(
-        description=f"""Perform a comprehensive keyword and skills gap analysis.
-
-        Candidate's Resume:
-        {resume_text}
-
-        Your task:
-        1. Extract ALL keywords from the resume:
-           - Technical skills
-           - Tools and technologies
-           - Soft skills
-           - Certifications
-           - Industry terms
+# Expected output format for the resume keyword profile task
+RESUME_PROFILE_OUTPUT = """A resume keyword profile in this EXACT format:
 
-        2. Compare against job requirements from the research and identify:
-           - MATCHING KEYWORDS: Skills in resume that match job requirements
-           - MISSING KEYWORDS: Critical skills in jobs NOT in resume
-           - PARTIAL MATCHES: Similar skills that need rewording
+## Resume Keyword Profile
 
-        3. Calculate a MATCH SCORE (0-100%) for each of the top 3 jobs based on:
-           - Required skills match (40% weight)
-           - Experience alignment (30% weight)
-           - Preferred qualifications (20% weight)
-           - Soft skills match (10% weight)
+### Keywords Found in Resume
+- **Technical Skills**: [List]
+- **Tools/Technologies**: [List]
+- **Soft Skills**: [List]
+- **Certifications**: [List]
+- **Industry Terms**: [List]
 
-        4. Provide SPECIFIC keyword recommendations:
-           - Exact phrases to add to resume
-           - Skills to learn/acquire
-           - Certifications that would boost candidacy
+### Experience Summary
+- **Years of Experience**: [X years]
+- **Recent Roles**: [List]
 
-        {"5. Use the FULL scraped job descriptions for more accurate keyword matching" if deep_search else ""}
+## Candidate Strengths
+- [Unique selling point 1]
+- [Unique selling point 2]
+- [Unique selling point 3]"""
 
-        Be specific and data-driven in your analysis.""",
-        expected_output="""A detailed analysis report in this EXACT format:
+# Expected output format for the keyword gap analysis task
+ANALYSIS_OUTPUT = """A detailed analysis report in this EXACT format:
 
 ## Resume Keyword Analysis
 
@@ -403,53 +262,17 @@ def create_crew(
 ## Candidate Strengths
 - [Unique selling point 1]
 - [Unique selling point 2]
-- [Unique selling point 3]""",
-        agent=profiler,
-        context=[search_task],
-    )
-
-    # Task 3: Write Content with Structured Report Format
-    write_task = Task(
-        description=f"""Create a comprehensive Job Application Report based on the job
-        research and resume analysis.
-
-        Your task is to produce a PROFESSIONALLY FORMATTED report with these sections:
-
-        1. EXECUTIVE SUMMARY
-           - Overall match assessment
-           - Top recommended job with match score
-           - Key action items
-
-        2. TAILORED COVER LETTER
-           - Professional, customizable template
-           - Placeholders for [Company Name] and [Position]
-           - Highlights matching skills from analysis
-           - Addresses gaps positively
-           - Under 350 words, compelling narrative
-           {"- Reference specific company values/culture from scraped data" if deep_search else ""}
-
-        3. OPTIMIZED RESUME BULLETS
-           - 7-10 powerful bullet points
-           - Incorporate missing keywords naturally
-           - Use metrics and quantifiable achievements
-           - ATS-friendly formatting
-
-        4. INTERVIEW PREPARATION
-           - 5 likely interview questions based on job requirements
-           - Suggested answers incorporating candidate's experience
-           - Key talking points
-           {"- Company-specific questions based on scraped culture info" if deep_search else ""}
+- [Unique selling point 3]"""
 
-        5. LINKEDIN OPTIMIZATION
-           - Suggested headline (120 chars max)
-           - Summary paragraph (2000 chars max)
-           - Skills to add to profile
+# Heading that starts the report in the write task's output, after the analysis
+REPORT_HEADING = "# Job Application Report"
 
-        Target role: {topic}
-        Work preference: {work_type}
+# How long a streamed write waits for REPORT_HEADING before showing the draft
+# anyway, in case the model leaves the heading out
+REPORT_HEADING_WAIT_SECONDS = 30
 
-        Format everything in clean, professional Markdown.""",
-        expected_output="""
+# Expected output format for the final Job Application Report
+REPORT_OUTPUT = """
 # Job Application Report
 
 ## Executive Summary
@@ -480,6 +303,15 @@ def create_crew(
 
 ---
 
+## Next Steps
+1. [Immediate action]
+2. [Short-term action]
+3. [Long-term action]
+"""
+
+# Expected output format for the interview and LinkedIn sections, which are
+# written alongside the analysis and spliced in ahead of "Next Steps"
+PREP_OUTPUT = """
 ## Interview Preparation
 
 ### Likely Questions
@@ -507,35 +339,1604 @@ def create_crew(
 [List of skills to add to LinkedIn profile]
 
 ---
+"""
 
-## Next Steps
-1. [Immediate action]
-2. [Short-term action]
-3. [Long-term action]
-""",
-        agent=writer,
-        context=[search_task, analyze_task],
-    )
+# Known scraping failures, matched in one pass over the error message and
+# mapped to the reason shown in the fallback notice
+SCRAPE_ERROR_RE = re.compile(r"(403|forbidden|404|not found|timeout|ssl|certificate)", re.IGNORECASE)
+SCRAPE_ERROR_REASONS = {
+    "403": "access forbidden (403)",
+    "forbidden": "access forbidden (403)",
+    "404": "page not found (404)",
+    "not found": "page not found (404)",
+    "timeout": "connection timeout",
+    "ssl": "SSL certificate error",
+    "certificate": "SSL certificate error",
+}
+
+# Serper web search endpoint used by ConcurrentSerperDevTool
+SERPER_SEARCH_URL = "https://google.serper.dev/search"
+
+# Job postings kept from the researcher's answer, and how many of the best
+# resume matches (by embedding similarity) are handed on to the later tasks
+MAX_RESEARCH_JOBS = 7
+CONTEXT_TOP_JOBS = 3
+
+# Token budget for the research handed to later tasks; past it, scraped job
+# descriptions are cut down first so the prompt stays well inside the range
+# where Gemini attends reliably. There is no local Gemini tokenizer, so
+# length is estimated at about four characters per token.
+CONTEXT_TOKEN_BUDGET = 24000
+CHARS_PER_TOKEN = 4
+
+# Recently scraped pages, keyed by URL. The same posting often turns up in
+# several snippets (company site, LinkedIn, Glassdoor variants of one link),
+# so a repeat scrape within a run is served from here instead of refetched.
+# Only successful scrapes are kept; a blocked or timed-out page is retried.
+SCRAPE_CACHE_SIZE = 32
+SCRAPE_CACHE_TTL_SECONDS = 600
+
+_scrape_cache = OrderedDict()
+_scrape_cache_lock = threading.Lock()
+
+# Keep-alive pool shared by every Serper query, sized for concurrent crews
+# each fanning a search out into several variants. Rate limits and server
+# errors are retried with exponential backoff (0.5s, 1s, 2s), and the
+# (connect, read) timeout keeps a hung connection from stalling a crew.
+SERPER_POOL_SIZE = 32
+SERPER_TIMEOUT = (3.05, 10)
+_serper_session = requests.Session()
+_serper_session.mount(
+    "https://",
+    requests.adapters.HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=SERPER_POOL_SIZE,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=None,
+        ),
+    ),
+)
+atexit.register(_serper_session.close)
+
+# On-disk caches live beside this module, wherever streamlit is launched from
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".topic_cache")
+
+# Raw Serper responses, keyed by SHA-256 of the query and result count, so
+# repeat searches (e.g. while only the salary filter changes) skip the API
+# call and its credit. Saved next to the research cache to survive restarts.
+SERPER_CACHE_SIZE = 256
+SERPER_CACHE_TTL_SECONDS = 6 * 3600
+SERPER_CACHE_PATH = os.path.join(CACHE_DIR, "serper_cache.json")
+
+_serper_cache = OrderedDict()
+_serper_cache_lock = threading.Lock()
+# Serializes writes of the cache file, which happen outside _serper_cache_lock
+_serper_cache_file_lock = threading.Lock()
+
+# Per-request timeout and retry budget for Gemini calls; the client backs
+# off exponentially between retries, so a stuck request fails in bounded time
+LLM_TIMEOUT_SECONDS = 60
+LLM_MAX_RETRIES = 2
+
+# Model routing: search summarizing and keyword extraction are structured,
+# bulk work that Flash handles at a fraction of Pro's cost and latency, so
+# only the long-form writing stays on Pro. Extraction runs greedy: sampling
+# only adds hedged, longer answers, and identical inputs should give
+# identical profiles and job lists.
+FAST_MODEL = "gemini-1.5-flash"
+FAST_TEMPERATURE = 0.0
+WRITER_MODEL = "gemini-1.5-pro"
+WRITER_TEMPERATURE = 0.7
+
+# Researcher output cache: reused when a new topic is this similar to a cached
+# one under identical preferences, and dropped once postings may be stale
+RESEARCH_CACHE_SIZE = 32
+RESEARCH_CACHE_THRESHOLD = 0.9
+RESEARCH_CACHE_TTL_SECONDS = 3600
+
+# Research cache entries are written here so similar searches keep hitting
+# the cache across restarts; entries past the TTL are dropped on load
+RESEARCH_CACHE_PATH = os.path.join(CACHE_DIR, "research_cache.json")
+
+# Shared across sessions - job research is cached unranked, so it holds no
+# candidate data; a hit is ranked against the current resume
+_research_cache = []
+_research_cache_lock = threading.Lock()
+# Serializes writes of the cache file, which happen outside _research_cache_lock
+_research_cache_file_lock = threading.Lock()
+
+# Resume keyword profiles kept in memory, keyed by SHA-256 of the resume text.
+# A resume whose SimHash is within RESUME_SIMHASH_MAX_BITS of a cached one
+# reuses that profile too; small edits such as typo fixes land well inside
+# this, while substantive rewrites of a resume differ by 15+ bits.
+RESUME_PROFILE_CACHE_SIZE = 64
+RESUME_SIMHASH_MAX_BITS = 6
+
+_resume_profile_cache = OrderedDict()
+_resume_profile_cache_lock = threading.Lock()
+
+# Character budget for the compacted resume given to tasks that only need
+# the gist of it (about 750 tokens); the profiler still reads it in full
+RESUME_COMPACT_CHARS = 3000
+
+
+class JobPosting(BaseModel):
+    """One job posting found by the researcher."""
+
+    title: str
+    company: str
+    location: str = ""
+    requirements: List[str] = Field(default_factory=list)
+    skills: List[str] = Field(default_factory=list)
+    experience: str = ""
+    salary: str = ""
+    url: str = ""
+    # Only filled in deep search mode
+    full_description: str = ""
+    company_culture: str = ""
+    tech_stack: str = ""
+    scrape_status: str = ""
+
+
+class RecommendedJob(BaseModel):
+    """A top pick among the postings and why it fits the candidate."""
+
+    job: str
+    reason: str = ""
+
+
+class SkillsInDemand(BaseModel):
+    """Skills aggregated across all postings."""
+
+    technical: List[str] = Field(default_factory=list)
+    soft: List[str] = Field(default_factory=list)
+    tools: List[str] = Field(default_factory=list)
+    certifications: List[str] = Field(default_factory=list)
+
+
+class DeepSearchInsights(BaseModel):
+    """Findings only available from scraped job pages."""
+
+    hidden_requirements: List[str] = Field(default_factory=list)
+    company_values: List[str] = Field(default_factory=list)
+    scraping_summary: str = ""
+
+
+class JobSearchReport(BaseModel):
+    """Structured output of the job search task."""
+
+    jobs: List[JobPosting] = Field(default_factory=list)
+    top_recommendations: List[RecommendedJob] = Field(default_factory=list)
+    skills_in_demand: SkillsInDemand = Field(default_factory=SkillsInDemand)
+    deep_search_insights: Optional[DeepSearchInsights] = None
 
-    # ========== CREATE AND RUN CREW ==========
 
-    crew = Crew(
-        agents=[researcher, profiler, writer],
-        tasks=[search_task, analyze_task, write_task],
-        process=Process.sequential,
-        verbose=True,
-    )
+def _jobs_markdown(task_output) -> str:
+    """
+    Render the job search task output as the Markdown report shown to users.
 
-    # Execute the crew
-    logger.info(f"Starting crew execution (deep_search={deep_search})")
-    result = crew.kickoff()
-    logger.info("Crew execution completed")
+    Falls back to the raw text when the researcher's answer could not be
+    parsed into a JobSearchReport.
+    """
+    report = getattr(task_output, "pydantic", None)
+    if not isinstance(report, JobSearchReport):
+        return getattr(task_output, "raw", None) or str(task_output)
+    return _report_markdown(report)
+
+
+def _report_markdown(report: JobSearchReport) -> str:
+    """Render a JobSearchReport as the Markdown job list shown to users."""
+    def join(items: List[str]) -> str:
+        return ", ".join(items) or "Not specified"
+
+    lines = ["## Job Opportunities Found", ""]
+    for number, job in enumerate(report.jobs, 1):
+        lines.append(f"### Job {number}: {job.title} at {job.company}")
+        lines.append(f"- **Location**: {job.location or 'Not specified'}")
+        lines.append(f"- **Requirements**: {join(job.requirements)}")
+        lines.append(f"- **Skills Needed**: {join(job.skills)}")
+        lines.append(f"- **Experience**: {job.experience or 'Not specified'}")
+        lines.append(f"- **Salary**: {job.salary or 'Not listed'}")
+        lines.append(f"- **URL**: {job.url or 'Not available'}")
+        for label, value in (
+            ("Full Description", job.full_description),
+            ("Company Culture", job.company_culture),
+            ("Tech Stack", job.tech_stack),
+            ("Scrape Status", job.scrape_status),
+        ):
+            if value:
+                lines.append(f"- **{label}**: {value}")
+        lines.append("")
+
+    lines += ["## Top 3 Recommended Positions"]
+    for number, pick in enumerate(report.top_recommendations, 1):
+        lines.append(f"{number}. {pick.job} - {pick.reason}" if pick.reason else f"{number}. {pick.job}")
+
+    skills = report.skills_in_demand
+    lines += [
+        "",
+        "## Skills in Demand (Aggregated)",
+        f"- Technical Skills: {join(skills.technical)}",
+        f"- Soft Skills: {join(skills.soft)}",
+        f"- Tools/Platforms: {join(skills.tools)}",
+        f"- Certifications: {join(skills.certifications)}",
+    ]
+
+    insights = report.deep_search_insights
+    if insights is not None:
+        lines += [
+            "",
+            "## Deep Search Insights",
+            f"- **Hidden Requirements Found**: {join(insights.hidden_requirements)}",
+            f"- **Common Company Values**: {join(insights.company_values)}",
+            f"- **Scraping Summary**: {insights.scraping_summary or 'Not available'}",
+        ]
+    return "\n".join(lines)
+
+
+def _scrape_key(url: str) -> str:
+    """Reduce a URL to its scrape cache key, ignoring fragments and trailing slashes."""
+    return url.strip().split("#")[0].rstrip("/")
 
-    # Return structured results
-    return {
-        "jobs": str(search_task.output) if search_task.output else "",
-        "analysis": str(analyze_task.output) if analyze_task.output else "",
-        "documents": str(write_task.output) if write_task.output else "",
-        "full_report": str(result),
-        "deep_search_enabled": deep_search,
-    }
+
+class SafeScrapeWebsiteTool(ScrapeWebsiteTool):
+    """
+    A wrapper around ScrapeWebsiteTool with built-in error handling.
+    Gracefully handles blocked websites and returns fallback data.
+    """
+
+    def _run(self, website_url: str) -> str:
+        """
+        Scrape website with error handling, reusing a recent successful scrape of the URL.
+
+        Args:
+            website_url: The URL to scrape
+
+        Returns:
+            Scraped content or fallback message
+        """
+        key = _scrape_key(website_url)
+        with _scrape_cache_lock:
+            entry = _scrape_cache.get(key)
+            if entry and time.time() - entry[1] <= SCRAPE_CACHE_TTL_SECONDS:
+                _scrape_cache.move_to_end(key)
+                logger.info(f"Reusing earlier scrape of {website_url}")
+                return entry[0]
+
+        result, scraped = self._scrape(website_url)
+        if scraped:
+            with _scrape_cache_lock:
+                _scrape_cache[key] = (result, time.time())
+                _scrape_cache.move_to_end(key)
+                while len(_scrape_cache) > SCRAPE_CACHE_SIZE:
+                    _scrape_cache.popitem(last=False)
+        return result
+
+    def _scrape(self, website_url: str) -> Tuple[str, bool]:
+        """
+        Scrape website with error handling for blocked/failed requests.
+
+        Returns:
+            Tuple of (scraped content or fallback message, whether the scrape succeeded)
+        """
+        try:
+            logger.info(f"Attempting to scrape: {website_url}")
+            result = super()._run(website_url=website_url)
+
+            if result and len(result) > 100:
+                logger.info(f"Successfully scraped {len(result)} characters from {website_url}")
+                return result, True
+            else:
+                logger.warning(f"Minimal content returned from {website_url}")
+                return self._fallback_message(website_url, "minimal content"), False
+
+        except Exception as e:
+            error_msg = str(e)
+            logger.error(f"Scraping failed for {website_url}: {e}")
+
+            # Handle specific error types
+            match = SCRAPE_ERROR_RE.search(error_msg)
+            if match:
+                return self._fallback_message(website_url, SCRAPE_ERROR_REASONS[match.group(1).lower()]), False
+            return self._fallback_message(website_url, f"error: {error_msg[:100]}"), False
+
+    def _fallback_message(self, url: str, reason: str) -> str:
+        """Generate a fallback message when scraping fails."""
+        return f"""
+[SCRAPING NOTICE]
+URL: {url}
+Status: Could not fully scrape this page ({reason})
+Action: Using search snippet data instead. Continue analysis with available information.
+
+Note: Some job boards block automated access. The search results still contain
+valuable information about this position. Proceed with the analysis using the
+job title, company name, and requirements from the search snippets.
+"""
+
+
+class BatchScrapeWebsiteToolSchema(BaseModel):
+    """Input for BatchScrapeWebsiteTool."""
+
+    website_urls: List[str] = Field(..., description="List of website URLs to read")
+
+
+class BatchScrapeWebsiteTool(BaseTool):
+    """
+    Scrapes several job posting URLs in one tool call.
+
+    Each URL would otherwise cost its own LLM -> tool -> LLM round trip.
+    Pages are fetched concurrently through SafeScrapeWebsiteTool, so blocked
+    sites still fall back to the usual scraping notice.
+    """
+
+    name: str = "Read multiple websites"
+    description: str = (
+        "Read the content of several websites at once. Pass every URL you want "
+        "to read in a single call."
+    )
+    args_schema: Type[BaseModel] = BatchScrapeWebsiteToolSchema
+    max_workers: int = 5
+
+    def _run(self, website_urls: List[str]) -> str:
+        """
+        Scrape the URLs in parallel.
+
+        Args:
+            website_urls: The URLs to scrape
+
+        Returns:
+            Each page's content (or fallback message) under a header naming its URL
+        """
+        # The agent often lists one posting more than once
+        website_urls = list({_scrape_key(url): url for url in website_urls}.values())
+        if not website_urls:
+            return "No URLs given."
+
+        scraper = _get_scrape_tool()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(website_urls))) as executor:
+            pages = list(executor.map(scraper._run, website_urls))
+
+        return "\n\n".join(
+            f"=== {url} ===\n{page}" for url, page in zip(website_urls, pages)
+        )
+
+
+class ConcurrentSerperDevTool(SerperDevTool):
+    """
+    A SerperDevTool that fans each search out into preference-specific variants.
+
+    The agent's query plus one variant per configured suffix (work type,
+    experience level) are sent to Serper concurrently, and the organic
+    results are merged and de-duplicated by link. One tool call therefore
+    covers what would otherwise take several sequential agent searches.
+    """
+
+    query_suffixes: List[str] = Field(default_factory=list)
+    max_merged_results: int = 20
+    # Per-instance key so concurrent crews with different keys never share one
+    api_key: str = Field(default="", repr=False)
+
+    def _run(self, **kwargs) -> dict:
+        """
+        Search Serper with the query and its variants in parallel.
+
+        Args:
+            search_query: The search query chosen by the agent
+
+        Returns:
+            Serper-style result dictionary with merged organic results
+        """
+        search_query = kwargs.get("search_query") or kwargs.get("query")
+        if not search_query:
+            raise ValueError("search_query is required")
+
+        queries = [search_query] + [f"{search_query} {suffix}" for suffix in self.query_suffixes]
+        with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+            responses, fetched = zip(*executor.map(self._search, queries))
+        if any(fetched):
+            _save_serper_cache()
+
+        organic, seen_links = [], set()
+        for response in responses:
+            for item in response.get("organic", []):
+                link = item.get("link")
+                if link and link not in seen_links:
+                    seen_links.add(link)
+                    organic.append(item)
+
+        return {
+            "searchParameters": {"q": search_query, "variants": queries[1:]},
+            "organic": organic[:self.max_merged_results],
+        }
+
+    def _search(self, query: str) -> Tuple[dict, bool]:
+        """
+        Run a single Serper query, returning an empty result on failure.
+
+        Returns:
+            Tuple of (Serper response, whether it was fetched and newly cached)
+        """
+        key = hashlib.sha256(f"{query}\n{self.n_results}".encode("utf-8")).hexdigest()
+        with _serper_cache_lock:
+            entry = _serper_cache.get(key)
+            if entry and time.time() - entry["created"] <= SERPER_CACHE_TTL_SECONDS:
+                _serper_cache.move_to_end(key)
+                return entry["response"], False
+
+        try:
+            response = _serper_session.post(
+                SERPER_SEARCH_URL,
+                headers={
+                    "X-API-KEY": self.api_key or os.environ.get("SERPER_API_KEY", ""),
+                    "content-type": "application/json",
+                },
+                json={"q": query, "num": self.n_results},
+                timeout=SERPER_TIMEOUT,
+            )
+            response.raise_for_status()
+            result = response.json()
+        except Exception as e:
+            logger.warning(f"Serper search failed for '{query}': {e}")
+            return {}, False
+
+        with _serper_cache_lock:
+            _serper_cache[key] = {"response": result, "created": time.time()}
+            _serper_cache.move_to_end(key)
+            while len(_serper_cache) > SERPER_CACHE_SIZE:
+                _serper_cache.popitem(last=False)
+        return result, True
+
+
+def _load_serper_cache():
+    """Restore unexpired Serper responses saved by a previous process."""
+    try:
+        with open(SERPER_CACHE_PATH, encoding="utf-8") as cache_file:
+            entries = json.load(cache_file)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable Serper cache file: {e}")
+        return
+
+    now = time.time()
+    with _serper_cache_lock:
+        _serper_cache.clear()
+        for key, entry in list(entries.items())[-SERPER_CACHE_SIZE:]:
+            if now - entry["created"] <= SERPER_CACHE_TTL_SECONDS:
+                _serper_cache[key] = entry
+
+
+def _save_serper_cache():
+    """
+    Write a snapshot of the Serper cache to disk.
+
+    Only the copy is taken under _serper_cache_lock, so concurrent lookups
+    never wait on the file write.
+    """
+    with _serper_cache_lock:
+        snapshot = dict(_serper_cache)
+    with _serper_cache_file_lock:
+        try:
+            os.makedirs(os.path.dirname(SERPER_CACHE_PATH), exist_ok=True)
+            temp_path = f"{SERPER_CACHE_PATH}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as cache_file:
+                json.dump(snapshot, cache_file)
+            os.replace(temp_path, SERPER_CACHE_PATH)
+        except OSError as e:
+            logger.warning(f"Could not persist Serper cache: {e}")
+
+
+_load_serper_cache()
+
+
+def _search_suffixes(work_type: str, experience_level: str) -> list:
+    """Turn search preferences into query suffixes for ConcurrentSerperDevTool."""
+    suffixes = []
+    if work_type != "Any":
+        suffixes.append(work_type.lower())
+    if experience_level != "Any":
+        # "Senior (5-8 years)" -> "Senior"
+        suffixes.append(experience_level.split("(")[0].strip())
+    return suffixes
+
+
+@lru_cache(maxsize=16)
+def _get_agent_llm(
+    gemini_key: str, model: str = WRITER_MODEL, temperature: float = WRITER_TEMPERATURE
+) -> LLM:
+    """
+    Return the CrewAI model the agents run on for an API key and model.
+
+    The key is passed to the model itself rather than through the
+    environment, so each run uses the key entered for it. The timeout and
+    retry budget go to the Gemini client's HTTP options (timeout in ms).
+    """
+    return LLM(
+        model=f"gemini/{model}",
+        api_key=gemini_key,
+        temperature=temperature,
+        client_params={
+            "http_options": {
+                "timeout": LLM_TIMEOUT_SECONDS * 1000,
+                "retry_options": {"attempts": LLM_MAX_RETRIES + 1},
+            },
+        },
+    )
+
+
+@lru_cache(maxsize=16)
+def _get_llm(
+    gemini_key: str, model: str = WRITER_MODEL, temperature: float = WRITER_TEMPERATURE
+) -> ChatGoogleGenerativeAI:
+    """
+    Return the LangChain Gemini chat model _stream_report streams from.
+
+    The client holds the underlying sync and async transports, so sharing one
+    instance lets concurrent and back-to-back reports reuse open connections
+    instead of re-establishing them for every run.
+    """
+    return ChatGoogleGenerativeAI(
+        model=model,
+        google_api_key=gemini_key,
+        temperature=temperature,
+        timeout=LLM_TIMEOUT_SECONDS,
+        max_retries=LLM_MAX_RETRIES,
+    )
+
+
+@lru_cache(maxsize=128)
+def _search_task_description(
+    topic: str, work_type: str, salary_range: str, experience_level: str, deep_search: bool
+) -> str:
+    """
+    Render the search task prompt, memoized per role and preferences.
+
+    Roles and preference combinations repeat across users, so popular ones
+    are rendered once and every run for them reuses the same string. Per-run
+    values sit at the end of the template, so the instructions ahead of them
+    are byte-identical for every search.
+    """
+    return SEARCH_TASK_TEMPLATES[deep_search].format_map({
+        "topic": topic,
+        "work_type": work_type,
+        "salary_range": salary_range,
+        "experience_level": experience_level,
+    })
+
+
+@lru_cache(maxsize=16)
+def _get_search_tool(serper_key: str, query_suffixes: tuple) -> ConcurrentSerperDevTool:
+    """
+    Return the Serper search tool for a key and set of query suffixes.
+
+    Tools are reused across runs instead of being rebuilt (and re-validated)
+    for every crew; their queries share the pooled Serper session.
+    """
+    return ConcurrentSerperDevTool(api_key=serper_key, query_suffixes=list(query_suffixes))
+
+
+@lru_cache(maxsize=1)
+def _get_scrape_tool() -> SafeScrapeWebsiteTool:
+    """Return the shared scraping tool used in deep search mode."""
+    return SafeScrapeWebsiteTool()
+
+
+@lru_cache(maxsize=1)
+def _get_batch_scrape_tool() -> BatchScrapeWebsiteTool:
+    """Return the shared batch scraping tool used in deep search mode."""
+    return BatchScrapeWebsiteTool()
+
+
+def _normalize_topic(topic: str) -> str:
+    """Lowercase a topic and collapse its whitespace for cache matching."""
+    return " ".join(topic.lower().split())
+
+
+def _load_research_cache():
+    """Restore unexpired research cache entries saved by a previous process."""
+    try:
+        with open(RESEARCH_CACHE_PATH, encoding="utf-8") as cache_file:
+            entries = json.load(cache_file)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable research cache file: {e}")
+        return
+
+    now = time.time()
+    with _research_cache_lock:
+        _research_cache[:] = [
+            {**entry, "preferences": tuple(entry["preferences"])}
+            for entry in entries
+            # Entries without "research" predate unranked caching
+            if "research" in entry and now - entry["created"] <= RESEARCH_CACHE_TTL_SECONDS
+        ][-RESEARCH_CACHE_SIZE:]
+
+
+def _save_research_cache():
+    """
+    Write a snapshot of the research cache to disk.
+
+    Only the copy is taken under _research_cache_lock, so concurrent lookups
+    never wait on the file write.
+    """
+    with _research_cache_lock:
+        snapshot = list(_research_cache)
+    with _research_cache_file_lock:
+        try:
+            os.makedirs(os.path.dirname(RESEARCH_CACHE_PATH), exist_ok=True)
+            temp_path = f"{RESEARCH_CACHE_PATH}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as cache_file:
+                json.dump(snapshot, cache_file)
+            os.replace(temp_path, RESEARCH_CACHE_PATH)
+        except OSError as e:
+            logger.warning(f"Could not persist research cache: {e}")
+
+
+def _research_cache_lookup(topic: str, preferences: tuple, gemini_key: str) -> tuple:
+    """
+    Look up researcher output from a recent, same or similar search.
+
+    Only entries with identical preferences are compared. An exact topic
+    match is served without embedding anything; otherwise the topic is
+    embedded and compared by cosine similarity. A hit is moved to the back
+    of the cache (most recently used).
+
+    Returns:
+        Tuple of (topic embedding or None if not embedded, cached research or None)
+    """
+    normalized_topic = _normalize_topic(topic)
+    with _research_cache_lock:
+        now = time.time()
+        _research_cache[:] = [
+            entry for entry in _research_cache
+            if now - entry["created"] <= RESEARCH_CACHE_TTL_SECONDS
+        ]
+        for entry in _research_cache:
+            if entry["topic"] == normalized_topic and entry["preferences"] == preferences:
+                _research_cache.remove(entry)
+                _research_cache.append(entry)
+                logger.info("Reusing job research for the same topic")
+                return None, entry["research"]
+
+    try:
+        vector = embed_text(normalized_topic, gemini_key)
+    except Exception as e:
+        logger.warning(f"Research cache unavailable, embedding failed: {e}")
+        return None, None
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    embedding = [value / norm for value in vector]
+
+    with _research_cache_lock:
+        best_entry, best_score = None, -1.0
+        for entry in _research_cache:
+            if entry["preferences"] != preferences:
+                continue
+            score = sum(a * b for a, b in zip(embedding, entry["embedding"]))
+            if score > best_score:
+                best_entry, best_score = entry, score
+
+        if best_entry is None or best_score < RESEARCH_CACHE_THRESHOLD:
+            return embedding, None
+
+        _research_cache.remove(best_entry)
+        _research_cache.append(best_entry)
+        logger.info(f"Reusing job research for a similar topic (similarity {best_score:.3f})")
+        return embedding, best_entry["research"]
+
+
+def _research_cache_store(topic: str, embedding: list, preferences: tuple, research: str):
+    """Cache unranked researcher output, evicting the least recently used entry."""
+    with _research_cache_lock:
+        _research_cache.append({
+            "topic": _normalize_topic(topic),
+            "embedding": embedding,
+            "preferences": preferences,
+            "research": research,
+            "created": time.time(),
+        })
+        if len(_research_cache) > RESEARCH_CACHE_SIZE:
+            _research_cache.pop(0)
+    _save_research_cache()
+
+
+_load_research_cache()
+
+
+def _simhash(text: str) -> int:
+    """64-bit SimHash over word trigrams; near-identical texts differ in few bits."""
+    tokens = text.lower().split()
+    shingles = [" ".join(tokens[i:i + 3]) for i in range(max(len(tokens) - 2, 1))]
+    weights = [0] * 64
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def _compact_resume(resume_text: str, max_chars: int = RESUME_COMPACT_CHARS) -> str:
+    """
+    Shrink a resume to its most informative lines, in their original order.
+
+    Lines are scored by the summed inverse line frequency of their words, so
+    lines naming specific skills, employers and results outrank boilerplate,
+    damped by length so long lines don't win on size alone. Duplicate lines
+    are dropped, and a resume already within max_chars is returned as is.
+    """
+    if len(resume_text) <= max_chars:
+        return resume_text
+
+    lines, seen = [], set()
+    for line in resume_text.splitlines():
+        key = " ".join(line.lower().split())
+        if key and key not in seen:
+            seen.add(key)
+            lines.append((line.strip(), set(key.split())))
+
+    line_frequency = {}
+    for _, words in lines:
+        for word in words:
+            line_frequency[word] = line_frequency.get(word, 0) + 1
+    total = len(lines)
+
+    def score(index: int) -> float:
+        words = lines[index][1]
+        weight = sum(math.log(total / line_frequency[word]) + 1 for word in words)
+        return weight / math.sqrt(len(words))
+
+    kept, used = set(), 0
+    for index in sorted(range(total), key=score, reverse=True):
+        size = len(lines[index][0]) + 1
+        if used + size <= max_chars:
+            kept.add(index)
+            used += size
+    return "\n".join(lines[index][0] for index in sorted(kept))
+
+
+def _resume_profile_lookup(resume_hash: str, resume_simhash: int) -> Optional[str]:
+    """
+    Return the cached keyword profile for a resume, if any.
+
+    An exact hash match wins; otherwise the closest entry within
+    RESUME_SIMHASH_MAX_BITS of the resume's SimHash is used.
+    """
+    with _resume_profile_cache_lock:
+        key = resume_hash if resume_hash in _resume_profile_cache else None
+        if key is None:
+            best_distance = RESUME_SIMHASH_MAX_BITS + 1
+            for cached_hash, (cached_simhash, _) in _resume_profile_cache.items():
+                distance = bin(resume_simhash ^ cached_simhash).count("1")
+                if distance < best_distance:
+                    key, best_distance = cached_hash, distance
+        if key is None:
+            return None
+        _resume_profile_cache.move_to_end(key)
+        return _resume_profile_cache[key][1]
+
+
+def _resume_profile_store(resume_hash: str, resume_simhash: int, profile: str):
+    """Cache a resume keyword profile, evicting the least recently used entry."""
+    with _resume_profile_cache_lock:
+        _resume_profile_cache[resume_hash] = (resume_simhash, profile)
+        _resume_profile_cache.move_to_end(resume_hash)
+        if len(_resume_profile_cache) > RESUME_PROFILE_CACHE_SIZE:
+            _resume_profile_cache.popitem(last=False)
+
+
+def _cosine(a: list, b: list) -> float:
+    """Cosine similarity of two vectors."""
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return sum(x * y for x, y in zip(a, b)) / norm if norm else 0.0
+
+
+def _job_text(job: JobPosting) -> str:
+    """Flatten a job posting into the text embedded for resume matching."""
+    return "\n".join(filter(None, [
+        f"{job.title} at {job.company}",
+        ", ".join(job.requirements),
+        ", ".join(job.skills),
+        job.experience,
+        job.tech_stack,
+        job.full_description,
+    ]))
+
+
+def _fit_context(text: str) -> str:
+    """Hard-cap context text at CONTEXT_TOKEN_BUDGET (estimated) tokens."""
+    limit = CONTEXT_TOKEN_BUDGET * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    logger.warning(f"Research context of ~{len(text) // CHARS_PER_TOKEN} tokens truncated to fit the budget")
+    return text[:limit]
+
+
+def _context_report(report: JobSearchReport, jobs: List[JobPosting]) -> str:
+    """
+    Serialize the report with only the given jobs as context for later tasks.
+
+    When that exceeds CONTEXT_TOKEN_BUDGET, each job's scraped full
+    description is shortened to an equal share of the remaining room; the
+    structured fields (requirements, skills, tech stack) are kept whole.
+    """
+    context = report.model_copy(update={"jobs": jobs}).model_dump_json(exclude_defaults=True)
+    limit = CONTEXT_TOKEN_BUDGET * CHARS_PER_TOKEN
+    if len(context) <= limit:
+        return context
+
+    without = [job.model_copy(update={"full_description": ""}) for job in jobs]
+    base = len(report.model_copy(update={"jobs": without}).model_dump_json(exclude_defaults=True))
+    # Leave room for each job's re-added "full_description" key
+    share = max((limit - base) // len(jobs) - 32, 0)
+    trimmed = [
+        job.model_copy(update={"full_description": job.full_description[:share]})
+        for job in jobs
+    ]
+    return _fit_context(
+        report.model_copy(update={"jobs": trimmed}).model_dump_json(exclude_defaults=True)
+    )
+
+
+def _rank_jobs_guardrail(resume_text: str, gemini_key: str):
+    """
+    Build a search task guardrail that ranks postings against the resume.
+
+    The jobs and the resume are embedded in one batched request and sorted
+    by cosine similarity, so ranking is plain vector math rather than LLM
+    work. The full ranked report stays on the task output for display,
+    while the raw text that later tasks receive as context carries only the
+    CONTEXT_TOP_JOBS best matches, bounding the analysis prompt.
+    """
+    def rank_jobs(task_output) -> Tuple[bool, Any]:
+        report = task_output.pydantic
+        if not isinstance(report, JobSearchReport) or not report.jobs:
+            task_output.raw = _fit_context(task_output.raw or "")
+            return True, task_output
+
+        ranked = _rank_report(report, resume_text, gemini_key)
+        task_output.pydantic = ranked
+        task_output.raw = _context_report(ranked, ranked.jobs[:CONTEXT_TOP_JOBS])
+        return True, task_output
+
+    return rank_jobs
+
+
+def _rank_report(report: JobSearchReport, resume_text: str, gemini_key: str) -> JobSearchReport:
+    """
+    Order a report's postings (at most MAX_RESEARCH_JOBS) by resume similarity.
+
+    The jobs and the resume are embedded in one batched request and sorted
+    by cosine similarity. If embedding fails the postings keep their order.
+    """
+    jobs = report.jobs[:MAX_RESEARCH_JOBS]
+    try:
+        *job_vectors, resume_vector = embed_texts(
+            [_job_text(job) for job in jobs] + [resume_text], gemini_key
+        )
+    except Exception as e:
+        logger.warning(f"Job ranking skipped, embedding failed: {e}")
+        job_vectors, resume_vector = [[] for _ in jobs], []
+
+    scores = [_cosine(vector, resume_vector) for vector in job_vectors]
+    ranked = [job for _, job in sorted(zip(scores, jobs), key=lambda pair: -pair[0])]
+    return report.model_copy(update={"jobs": ranked})
+
+
+def _rank_cached_research(research: str, resume_text: str, gemini_key: str) -> tuple:
+    """
+    Render cached job research for this candidate.
+
+    Cached reports are stored unranked, so their postings are first ranked
+    against this resume. As on a fresh search, later tasks only get the
+    CONTEXT_TOP_JOBS best matches within CONTEXT_TOKEN_BUDGET. Research that
+    could not be parsed into a JobSearchReport is shown as it was cached.
+
+    Returns:
+        Tuple of (Markdown shown to the user, context text for later tasks)
+    """
+    try:
+        report = JobSearchReport.model_validate_json(research)
+    except ValueError:
+        return research, _fit_context(research)
+    ranked = _rank_report(report, resume_text, gemini_key)
+    return _report_markdown(ranked), _context_report(ranked, ranked.jobs[:CONTEXT_TOP_JOBS])
+
+
+class _SideTask:
+    """
+    A task run outside the crew, on its own thread, once its context is ready.
+
+    The sequential process only overlaps adjacent async tasks, so a task that
+    needs the research but not the analysis is started from the research
+    task's callback and joined after the crew finishes. The resume profile
+    runs this way too when the write task is streamed and no longer ends
+    the crew.
+    """
+
+    def __init__(self, task: Task):
+        self.task = task
+        self._future = None
+
+    def start(self, context: str):
+        """Begin executing the task with the given context text."""
+        if self._future is None:
+            self._future = self.task.execute_async(context=context)
+
+    def result(self) -> str:
+        """Wait for the task and return its output ("" if it never started)."""
+        if self._future is None:
+            return ""
+        return str(self._future.result())
+
+
+def _stage_callback(
+    on_stage: Optional[Callable[[str, str], None]],
+    key: str,
+    render: Callable[[object], str] = str,
+):
+    """Adapt an on_stage hook into a CrewAI task callback for one result key."""
+    if on_stage is None:
+        return None
+    return lambda task_output: on_stage(key, render(task_output))
+
+
+def _build_crew(
+    topic: str,
+    resume_text: str,
+    gemini_key: str,
+    serper_key: str,
+    work_type: str,
+    salary_range: str,
+    experience_level: str,
+    deep_search: bool,
+    on_stage: Optional[Callable[[str, str], None]] = None,
+    cached_jobs: Optional[str] = None,
+    cached_profile: Optional[str] = None,
+    stream_report: bool = False,
+    verbose: bool = VERBOSE,
+) -> tuple:
+    """
+    Build the agents, tasks, and crew for a job search run.
+
+    on_stage, when given, is called with the result key ("jobs" or
+    "analysis") and the task output as soon as each task finishes.
+    When cached_jobs or cached_profile is given, the research or resume
+    profile task is skipped and that output is handed to the later tasks
+    instead. With stream_report, the write task is built but left out of
+    the crew so _stream_report can generate it token by token. verbose
+    turns on CrewAI's per-step agent and crew output.
+
+    Returns:
+        Tuple of (crew, search_task, resume_profile_task, write_task, prep,
+        profile); a skipped task (or an empty crew) is returned as None, prep
+        is the _SideTask writing the interview and LinkedIn sections, and
+        profile is the _SideTask running the resume profile task when it has
+        to run outside the crew (otherwise None)
+    """
+    # Pro for writing; the Flash research and extraction agents are built below
+    llm = _get_agent_llm(gemini_key)
+
+    # ========== DEFINE AGENTS ==========
+    # Agents whose task is served from a cache are never built
+
+    # Agent 1: Job Researcher (Enhanced with scraping capabilities)
+    # The role, goal and backstory form the agent's system prompt, the first
+    # thing Gemini sees on every call. They stay free of per-run values (the
+    # topic and preferences live in the task) so the prefix is identical
+    # across runs and Gemini's implicit prompt caching can reuse it.
+    researcher = None
+    if cached_jobs is None:
+        researcher_tools = [
+            _get_search_tool(serper_key, tuple(_search_suffixes(work_type, experience_level)))
+        ]
+        if deep_search:
+            # Add scraping tools for deep search mode
+            researcher_tools += [_get_scrape_tool(), _get_batch_scrape_tool()]
+            logger.info("Deep search enabled: Scraping tool activated")
+
+        researcher = Agent(
+            role="Senior Job Market Researcher" + (" & Web Intelligence Specialist" if deep_search else ""),
+            goal="Find the best job opportunities for the requested role that match the candidate's stated preferences"
+                 + (" and extract full job details using web scraping" if deep_search else ""),
+            backstory=DEEP_RESEARCHER_BACKSTORY if deep_search else RESEARCHER_BACKSTORY,
+            tools=researcher_tools,
+            llm=_get_agent_llm(gemini_key, FAST_MODEL, FAST_TEMPERATURE),
+            verbose=verbose,
+            allow_delegation=False,
+        )
+
+    # Agent 2: Resume Profiler (Enhanced as Technical Recruiter)
+    profiler = None
+    if cached_profile is None:
+        profiler = Agent(
+            role="Senior Technical Recruiter & ATS Expert",
+            goal="Perform deep keyword analysis between resume and job requirements to maximize ATS compatibility",
+            backstory=PROFILER_BACKSTORY,
+            llm=_get_agent_llm(gemini_key, FAST_MODEL, FAST_TEMPERATURE),
+            verbose=verbose,
+            allow_delegation=False,
+        )
+
+    # Agent 3: Content Writer (Enhanced for structured output). A second
+    # instance writes the interview and LinkedIn sections, which can run at
+    # the same time as the main report.
+    writer_config = dict(
+        role="Executive Career Content Strategist",
+        goal="Analyze resume keyword gaps and turn them into a comprehensive, "
+             "professionally formatted Job Application Report",
+        backstory=WRITER_BACKSTORY,
+        llm=llm,
+        verbose=verbose,
+        allow_delegation=False,
+    )
+    writer = Agent(**writer_config)
+    prep_writer = Agent(**{
+        **writer_config,
+        "goal": "Prepare the candidate for interviews and optimize their LinkedIn profile",
+    })
+
+    # ========== DEFINE TASKS ==========
+
+    # Task 1: Search for Jobs (Enhanced with deep search capabilities)
+    search_task_description = _search_task_description(
+        topic, work_type, salary_range, experience_level, deep_search
+    )
+
+    # Task 3b: Interview and LinkedIn sections. They need the job research
+    # and the resume but not the gap analysis, so they are started as soon as
+    # the research is in and written while the analysis runs.
+    prep = _SideTask(Task(
+        description=f"""Write the interview preparation and LinkedIn sections of a Job
+        Application Report from the job research and the candidate's resume.
+
+        Your task is to produce these sections:
+
+        1. INTERVIEW PREPARATION
+           - 5 likely interview questions based on job requirements
+           - Suggested answers incorporating candidate's experience
+           - Key talking points
+           {"- Company-specific questions based on scraped culture info" if deep_search else ""}
+
+        2. LINKEDIN OPTIMIZATION
+           - Suggested headline (120 chars max)
+           - Summary paragraph (2000 chars max)
+           - Skills to add to profile
+
+        Format everything in clean, professional Markdown.
+
+        Target role: {topic}
+
+        Candidate's Resume (condensed):
+        {_compact_resume(resume_text)}""" + (f"""
+
+        Job research from a recent search for a similar role:
+        {cached_jobs}""" if cached_jobs is not None else ""),
+        expected_output=PREP_OUTPUT,
+        agent=prep_writer,
+    ))
+    jobs_stage = _stage_callback(on_stage, "jobs", _jobs_markdown)
+
+    def on_research(task_output):
+        prep.start(task_output.raw)
+        if jobs_stage is not None:
+            jobs_stage(task_output)
+
+    # The researcher runs asynchronously so the resume profile below, which
+    # only needs the resume, is extracted while job search is in flight.
+    if cached_jobs is None:
+        search_task = Task(
+            description=search_task_description,
+            # Compact JSON, rendered to Markdown locally by _jobs_markdown
+            expected_output=EXPECTED_OUTPUT_JOBS[deep_search],
+            output_pydantic=JobSearchReport,
+            guardrail=_rank_jobs_guardrail(resume_text, gemini_key),
+            agent=researcher,
+            async_execution=True,
+            callback=on_research,
+        )
+        research_context = ""
+    else:
+        search_task = None
+        research_context = f"""
+
+        Job research from a recent search for a similar role:
+        {cached_jobs}"""
+
+    # Task 2a: Extract Resume Keywords (independent of the job research)
+    # Every task keeps its static instructions first and per-run inputs last,
+    # so all runs share a byte-identical prompt prefix for Gemini's implicit
+    # caching. Repeat runs with the same resume skip this task entirely.
+    profile_context = ""
+    if cached_profile is not None:
+        profile_context = f"""
+
+        Candidate's resume keyword profile:
+        {cached_profile}"""
+    resume_profile_task = None if cached_profile is not None else Task(
+        description=f"""Build a keyword profile of the candidate's resume below for ATS matching.
+
+        Your task:
+        1. Extract ALL keywords from the resume:
+           - Technical skills
+           - Tools and technologies
+           - Soft skills
+           - Certifications
+           - Industry terms
+
+        2. Summarize total years of professional experience and the most
+           recent role titles.
+
+        3. Identify the candidate's 3 strongest unique selling points.
+
+        Report only what the resume states. Do not infer skills it does not mention.
+
+        Candidate's Resume:
+        {resume_text}""",
+        expected_output=RESUME_PROFILE_OUTPUT,
+        agent=profiler,
+        async_execution=True,
+    )
+
+    # Task 3: Keyword Gap Analysis and Job Application Report (waits on both
+    # the research and the profile). Both parts work from the same research and
+    # profile, so one call writes them back to back instead of shipping that
+    # context to the LLM twice; _split_report separates them afterwards.
+    write_task = Task(
+        description=f"""Perform a comprehensive keyword and skills gap analysis using the
+        candidate's resume keyword profile and the job research, then turn it into a
+        Job Application Report. Write the analysis first, then the report starting
+        with the heading "{REPORT_HEADING}".
+
+        PART 1 - KEYWORD GAP ANALYSIS
+        1. Restate the keywords found in the resume from the keyword profile.
+
+        2. Compare against job requirements from the research and identify:
+           - MATCHING KEYWORDS: Skills in resume that match job requirements
+           - MISSING KEYWORDS: Critical skills in jobs NOT in resume
+           - PARTIAL MATCHES: Similar skills that need rewording
+
+        3. Calculate a MATCH SCORE (0-100%) for each of the top 3 jobs based on:
+           - Required skills match (40% weight)
+           - Experience alignment (30% weight)
+           - Preferred qualifications (20% weight)
+           - Soft skills match (10% weight)
+
+        4. Provide SPECIFIC keyword recommendations:
+           - Exact phrases to add to resume
+           - Skills to learn/acquire
+           - Certifications that would boost candidacy
+
+        {"5. Use the FULL scraped job descriptions for more accurate keyword matching" if deep_search else ""}
+
+        Be specific and data-driven in your analysis.
+
+        PART 2 - JOB APPLICATION REPORT
+        Produce a PROFESSIONALLY FORMATTED report with these sections:
+
+        1. EXECUTIVE SUMMARY
+           - Overall match assessment
+           - Top recommended job with match score
+           - Key action items
+
+        2. TAILORED COVER LETTER
+           - Professional, customizable template
+           - Placeholders for [Company Name] and [Position]
+           - Highlights matching skills from analysis
+           - Addresses gaps positively
+           - Under 350 words, compelling narrative
+           {"- Reference specific company values/culture from scraped data" if deep_search else ""}
+
+        3. OPTIMIZED RESUME BULLETS
+           - 7-10 powerful bullet points
+           - Incorporate missing keywords naturally
+           - Use metrics and quantifiable achievements
+           - ATS-friendly formatting
+
+        4. NEXT STEPS
+           - Immediate, short-term and long-term actions
+
+        Format everything in clean, professional Markdown.
+
+        Target role: {topic}
+        Work preference: {work_type}""" + profile_context + research_context,
+        expected_output=f"{ANALYSIS_OUTPUT}\n\nFollowed by:\n{REPORT_OUTPUT}",
+        agent=writer,
+        context=[task for task in (search_task, resume_profile_task) if task is not None],
+        callback=_stage_callback(on_stage, "analysis", lambda output: _split_report(str(output))[0]),
+    )
+
+    # ========== CREATE CREW ==========
+
+    crew_tasks = [search_task, resume_profile_task]
+    if not stream_report:
+        crew_tasks.append(write_task)
+    crew_tasks = [task for task in crew_tasks if task is not None]
+
+    # A crew may end with at most one async task. Without the write task to
+    # join on, the profile runs beside the crew instead, so it still overlaps
+    # the research; _stream_report waits for it before writing.
+    profile = None
+    if stream_report and search_task is not None and resume_profile_task is not None:
+        profile = _SideTask(resume_profile_task)
+        crew_tasks.remove(resume_profile_task)
+
+    # With streaming and both the research and the profile cached, nothing is
+    # left for the crew to run
+    crew = None
+    if crew_tasks:
+        crew = Crew(
+            agents=[agent for agent in (researcher, profiler, writer)
+                    if any(task.agent is agent for task in crew_tasks)],
+            tasks=crew_tasks,
+            process=Process.sequential,
+            verbose=verbose,
+        )
+
+    if search_task is None:
+        prep.start("")
+
+    return crew, search_task, resume_profile_task, write_task, prep, profile
+
+
+def _split_report(text: str) -> tuple:
+    """
+    Split the write task's output into (analysis, report) at REPORT_HEADING.
+
+    If the heading is missing, everything is treated as the report.
+    """
+    report_start = text.find(REPORT_HEADING)
+    if report_start == -1:
+        return "", text
+    return text[:report_start].strip(), text[report_start:]
+
+
+def _collect_results(
+    search_task: Optional[Task],
+    deep_search: bool,
+    cached_jobs: Optional[str],
+    analysis: str,
+    documents: str,
+) -> dict:
+    """Gather each stage's output into the structured result dictionary."""
+    if search_task is None:
+        jobs = cached_jobs or ""
+    else:
+        jobs = _jobs_markdown(search_task.output) if search_task.output else ""
+    return {
+        "jobs": jobs,
+        "analysis": analysis,
+        "documents": documents,
+        "full_report": documents,
+        "deep_search_enabled": deep_search,
+        # Stamped on PDF exports, so every download of a result shows the same time
+        "generated_at": time.time(),
+    }
+
+
+def _prepare_run(
+    topic: str,
+    resume_text: str,
+    gemini_key: str,
+    serper_key: str,
+    work_type: str,
+    salary_range: str,
+    experience_level: str,
+    deep_search: bool,
+    on_stage: Optional[Callable[[str, str], None]],
+    stream_report: bool = False,
+    verbose: bool = VERBOSE,
+) -> dict:
+    """
+    Consult the research and resume profile caches, then build the crew.
+
+    Cached stage output is reported through on_stage straight away, since
+    no task will run for it.
+
+    Returns:
+        Run state consumed by _finish_run once the crew has finished
+    """
+    preferences = (work_type, salary_range, experience_level, deep_search)
+    # The research lookup waits on an embedding request, so hash the resume
+    # and check the profile cache while it is in flight
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        research_lookup = executor.submit(_research_cache_lookup, topic, preferences, gemini_key)
+        resume_hash = hashlib.sha256(resume_text.encode("utf-8")).hexdigest()
+        resume_simhash = _simhash(resume_text)
+        cached_profile = _resume_profile_lookup(resume_hash, resume_simhash)
+        embedding, cached_research = research_lookup.result()
+    if cached_profile is not None:
+        logger.info("Reusing cached resume keyword profile")
+    cached_jobs = jobs_context = None
+    if cached_research is not None:
+        cached_jobs, jobs_context = _rank_cached_research(cached_research, resume_text, gemini_key)
+
+    crew, search_task, resume_profile_task, write_task, prep, profile = _build_crew(
+        topic, resume_text, gemini_key, serper_key,
+        work_type, salary_range, experience_level, deep_search,
+        on_stage, jobs_context, cached_profile, stream_report, verbose,
+    )
+    if cached_jobs is not None and on_stage is not None:
+        on_stage("jobs", cached_jobs)
+
+    return {
+        "crew": crew,
+        "search_task": search_task,
+        "resume_profile_task": resume_profile_task,
+        "write_task": write_task,
+        "prep": prep,
+        "profile": profile,
+        "deep_search": deep_search,
+        "topic": topic,
+        "preferences": preferences,
+        "embedding": embedding,
+        "cached_jobs": cached_jobs,
+        "resume_hash": resume_hash,
+        "resume_simhash": resume_simhash,
+        "gemini_key": gemini_key,
+        "on_stage": on_stage,
+    }
+
+
+def _stream_report(run: dict, on_token: Callable[[str], None]) -> str:
+    """
+    Generate the write task's analysis and report with a streaming Gemini call.
+
+    CrewAI only hands back a task's output once it is complete, so the writer
+    is prompted directly here. The prompt mirrors what the writer agent would
+    have been given. The analysis is reported through on_stage once the
+    report heading appears, and every report chunk from then on is passed to
+    on_token as it arrives. A heading at the very start means there is no
+    analysis to hold back; if none arrives within REPORT_HEADING_WAIT_SECONDS,
+    everything written so far is forwarded as the draft, and the analysis (if
+    the heading shows up later) is reported once the stream ends.
+
+    Returns:
+        The full text, analysis and report
+    """
+    write_task = run["write_task"]
+    writer = write_task.agent
+    if run["profile"] is not None:
+        run["profile"].result()
+
+    # Cached research and profiles are already part of the task description
+    context = ""
+    for task in (run["search_task"], run["resume_profile_task"]):
+        if task is not None and task.output:
+            context += f"\n\n{task.output.raw}"
+
+    messages = [
+        ("system", f"You are {writer.role}. {writer.backstory}\nYour goal: {writer.goal}"),
+        ("human", f"{write_task.description}\n\nExpected output:\n{write_task.expected_output}{context}"),
+    ]
+
+    on_stage = run["on_stage"]
+    chunks, drafting, analysis_sent = [], False, False
+    deadline = time.monotonic() + REPORT_HEADING_WAIT_SECONDS
+    for chunk in _get_llm(run["gemini_key"]).stream(messages):
+        text = chunk.content
+        if not text:
+            continue
+        chunks.append(text)
+        if drafting:
+            on_token(text)
+            continue
+
+        # The heading may be split across chunks, so search what has arrived
+        written = "".join(chunks)
+        report_start = written.find(REPORT_HEADING)
+        if report_start == -1 and time.monotonic() < deadline:
+            continue
+        drafting = True
+        if report_start == -1:
+            on_token(written)
+            continue
+        analysis = written[:report_start].strip()
+        if analysis and on_stage is not None:
+            on_stage("analysis", analysis)
+            analysis_sent = True
+        on_token(written[report_start:])
+
+    written = "".join(chunks)
+    if not analysis_sent and on_stage is not None:
+        analysis = _split_report(written)[0]
+        if analysis:
+            on_stage("analysis", analysis)
+    return written
+
+
+def _merge_report(report: str, prep_sections: str) -> str:
+    """Insert the interview and LinkedIn sections ahead of the report's Next Steps."""
+    if not prep_sections:
+        return report
+    prep_sections = prep_sections.strip()
+    next_steps = report.find("## Next Steps")
+    if next_steps == -1:
+        return f"{report.rstrip()}\n\n{prep_sections}\n"
+    return f"{report[:next_steps]}{prep_sections}\n\n{report[next_steps:]}"
+
+
+def _finish_run(run: dict, written: Optional[str] = None) -> dict:
+    """
+    Split the write task's output, join the interview and LinkedIn sections
+    into the report, collect the results and store fresh stage output in the
+    caches.
+
+    written, when given, is the streamed write task output, which then never
+    ran inside the crew.
+    """
+    if written is None:
+        write_output = run["write_task"].output
+        written = str(write_output) if write_output else ""
+    analysis, documents = _split_report(written)
+    documents = _merge_report(documents, run["prep"].result())
+    if run["on_stage"] is not None:
+        run["on_stage"]("documents", documents)
+
+    results = _collect_results(
+        run["search_task"], run["deep_search"], run["cached_jobs"], analysis, documents,
+    )
+    search_task = run["search_task"]
+    if run["embedding"] is not None and search_task is not None and results["jobs"]:
+        report = search_task.output.pydantic
+        research = results["jobs"]
+        if isinstance(report, JobSearchReport):
+            # The ranking belongs to this resume, so the postings are stored in
+            # a fixed order and ranked again for whoever hits the entry
+            jobs = sorted(report.jobs, key=lambda job: (job.company.lower(), job.title.lower()))
+            research = report.model_copy(update={"jobs": jobs}).model_dump_json()
+        _research_cache_store(run["topic"], run["embedding"], run["preferences"], research)
+
+    profile_task = run["resume_profile_task"]
+    if profile_task is not None and profile_task.output:
+        _resume_profile_store(run["resume_hash"], run["resume_simhash"], str(profile_task.output))
+    return results
+
+
+def create_crew(
+    topic: str,
+    resume_text: str,
+    gemini_key: str,
+    serper_key: str,
+    work_type: str = "Any",
+    salary_range: str = "Not specified",
+    experience_level: str = "Any",
+    deep_search: bool = False,
+    on_stage: Optional[Callable[[str, str], None]] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+    verbose: bool = VERBOSE,
+) -> dict:
+    """
+    Create and run a CrewAI crew for job searching and resume optimization.
+
+    Args:
+        topic: Job title or search topic (e.g., "Senior Python Developer")
+        resume_text: The user's resume content
+        gemini_key: Google Gemini API key
+        serper_key: Serper API key for web search
+        work_type: Preferred work arrangement (Remote/Hybrid/On-site/Any)
+        salary_range: Expected salary range
+        experience_level: Experience level (Entry/Mid/Senior/Any)
+        deep_search: Enable deep scraping of job posting URLs for detailed analysis
+        on_stage: Optional hook called with (result_key, output) as each task finishes
+        on_token: Optional hook called with each chunk of the final report as
+            it is generated; the writer then streams instead of running in the crew
+        verbose: Print CrewAI's per-step agent output (defaults to JOBCREW_DEBUG=1)
+
+    Returns:
+        Dictionary containing structured results from each task
+    """
+    run = _prepare_run(
+        topic, resume_text, gemini_key, serper_key,
+        work_type, salary_range, experience_level, deep_search, on_stage,
+        on_token is not None, verbose,
+    )
+
+    # Execute the crew
+    logger.info(f"Starting crew execution (deep_search={deep_search})")
+    if run["profile"] is not None:
+        run["profile"].start("")
+    if run["crew"] is not None:
+        run["crew"].kickoff()
+    written = _stream_report(run, on_token) if on_token is not None else None
+    logger.info("Crew execution completed")
+
+    return _finish_run(run, written)
+
+
+async def create_crew_async(
+    topic: str,
+    resume_text: str,
+    gemini_key: str,
+    serper_key: str,
+    work_type: str = "Any",
+    salary_range: str = "Not specified",
+    experience_level: str = "Any",
+    deep_search: bool = False,
+    on_stage: Optional[Callable[[str, str], None]] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+    verbose: bool = VERBOSE,
+) -> dict:
+    """
+    Async variant of create_crew built on Crew.kickoff_async().
+
+    Takes the same arguments as create_crew. The crew runs without blocking
+    the event loop, so callers can overlap it with other I/O-bound work. Note
+    that on_stage and on_token may be invoked from a worker thread.
+
+    Returns:
+        Dictionary containing structured results from each task
+    """
+    # The cache lookups embed the topic over the network, so keep them off the loop
+    run = await asyncio.to_thread(
+        _prepare_run,
+        topic, resume_text, gemini_key, serper_key,
+        work_type, salary_range, experience_level, deep_search, on_stage,
+        on_token is not None, verbose,
+    )
+
+    # Execute the crew
+    logger.info(f"Starting async crew execution (deep_search={deep_search})")
+    if run["profile"] is not None:
+        run["profile"].start("")
+    if run["crew"] is not None:
+        await run["crew"].kickoff_async()
+    written = None
+    if on_token is not None:
+        written = await asyncio.to_thread(_stream_report, run, on_token)
+    logger.info("Async crew execution completed")
+
+    return _finish_run(run, written)
+
+
+async def create_crew_stream(
+    topic: str,
+    resume_text: str,
+    gemini_key: str,
+    serper_key: str,
+    work_type: str = "Any",
+    salary_range: str = "Not specified",
+    experience_level: str = "Any",
+    deep_search: bool = False,
+    stream_report: bool = True,
+    verbose: bool = VERBOSE,
+) -> AsyncIterator[dict]:
+    """
+    Run the crew, yielding progress events as they happen.
+
+    Takes the same arguments as create_crew; stream_report controls whether
+    the report is streamed token by token. Events are dictionaries with a
+    "stage" and its "data":
+        - "jobs", "analysis", "documents": a stage's output as it finishes
+        - "token": a chunk of the report (only with stream_report)
+        - "result": the final results dictionary, always the last event
+
+    Events are yielded on the caller's event loop even though the crew emits
+    them from worker threads.
+    """
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def push(stage: str, data):
+        loop.call_soon_threadsafe(events.put_nowait, {"stage": stage, "data": data})
+
+    crew_run = asyncio.ensure_future(create_crew_async(
+        topic, resume_text, gemini_key, serper_key,
+        work_type, salary_range, experience_level, deep_search,
+        on_stage=push,
+        on_token=(lambda text: push("token", text)) if stream_report else None,
+        verbose=verbose,
+    ))
+    while True:
+        next_event = asyncio.ensure_future(events.get())
+        await asyncio.wait({crew_run, next_event}, return_when=asyncio.FIRST_COMPLETED)
+        if not next_event.done():
+            next_event.cancel()
+            break
+        yield next_event.result()
+
+    while not events.empty():
+        yield events.get_nowait()
+    yield {"stage": "result", "data": crew_run.result()}
@@ -0,0 +1,356 @@
+"""
+PDF export helpers for the Multi-Agent Job Search System.
+Renders the agents' Markdown output into professionally styled PDF reports.
+"""
+
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+from fpdf import FPDF
+
+# Markdown patterns applied to every line, compiled once at import
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+_ITALIC_RE = re.compile(r'\*(.*?)\*')
+_CODE_RE = re.compile(r'`(.*?)`')
+_NUMLIST_RE = re.compile(r'^\d+\.')
+
+# Table of contents entries for the all-in-one report
+_TOC_SECTIONS = (
+    "1. Job Opportunities Found",
+    "2. Resume Match Analysis",
+    "3. Application Documents",
+    "4. Complete Report",
+)
+
+
+def _iter_lines(content: str):
+    """Yield the lines of content one at a time without building a list."""
+    start = 0
+    end = content.find('\n')
+    while end != -1:
+        yield content[start:end]
+        start = end + 1
+        end = content.find('\n', start)
+    yield content[start:]
+
+
+def _to_latin1(text: str) -> str:
+    """Replace characters the core PDF fonts cannot encode with '?'."""
+    if text.isascii():
+        return text
+    return text.encode('latin-1', 'replace').decode('latin-1')
+
+
+def _header_level(line: str) -> int:
+    """Return the markdown header level of a line, or 0 if it is not a header."""
+    if line[:1] != '#':
+        return 0
+    level = len(line) - len(line.lstrip('#'))
+    return level if line[level:level + 1] == ' ' else 0
+
+
+@lru_cache(maxsize=4096)
+def _strip_md(line: str) -> str:
+    """
+    Remove inline bold/italic/code markers, keeping the wrapped text.
+
+    The passes run in sequence, so markers nested inside bold text (italics,
+    inline code) are removed too. Memoized because reports repeat many short
+    lines (labels, boilerplate).
+    """
+    if '*' not in line and '`' not in line:
+        return line
+    line = _BOLD_RE.sub(r'\1', line)  # Bold
+    line = _ITALIC_RE.sub(r'\1', line)  # Italic
+    return _CODE_RE.sub(r'\1', line)  # Code
+
+
+@lru_cache(maxsize=32)
+def _parse_markdown(content: str) -> tuple:
+    """
+    Parse markdown into a tuple of (kind, level, text) tokens, one per line.
+
+    Kinds are 'blank', 'header', 'bullet', 'bold', 'rule' and 'text'; 'text'
+    carries the line with inline markers already stripped. Which lines join
+    into a paragraph differs between the renderers, so each one buffers them
+    itself. Cached so a section rendered on its own and again inside the
+    all-in-one report is parsed once.
+    """
+    tokens = []
+    for line in _iter_lines(content):
+        line = line.strip()
+        level = _header_level(line)
+        if not line:
+            tokens.append(('blank', 0, ''))
+        elif level:
+            tokens.append(('header', level, line[level + 1:]))
+        elif line[:2] in ('- ', '* '):
+            tokens.append(('bullet', 0, line[2:]))
+        elif _NUMLIST_RE.match(line):
+            tokens.append(('bullet', 0, line))
+        # '***' counts as bold here; process_markdown_to_pdf renders it as a rule
+        elif line.startswith('**') and line.endswith('**'):
+            tokens.append(('bold', 0, line))
+        elif line == '---':
+            tokens.append(('rule', 0, line))
+        else:
+            tokens.append(('text', 0, _strip_md(line)))
+    return tuple(tokens)
+
+
+def _header_line(level: int, text: str) -> str:
+    """Rebuild a header line rendered as plain body text, markers stripped."""
+    return _strip_md(f"{'#' * level} {text}")
+
+
+def _flush_body(pdf, body_lines: list):
+    """Render buffered body lines as a single paragraph and clear the buffer."""
+    if body_lines:
+        pdf.body_text('\n'.join(body_lines))
+        body_lines.clear()
+
+
+class ProfessionalPDF(FPDF):
+    """Custom PDF class with professional styling."""
+
+    def __init__(self, generated_at: Optional[datetime] = None):
+        super().__init__()
+        self.set_auto_page_break(auto=True, margin=15)
+        # Stamped once so every page of a document shows the same time
+        self.generated_at = generated_at or datetime.now()
+        self._footer_stamp = self.generated_at.strftime('%Y-%m-%d %H:%M')
+        self.set_creation_date(self.generated_at.astimezone())
+
+    def header(self):
+        """Add header to each page."""
+        self.set_font("Helvetica", "B", 10)
+        self.set_text_color(100, 100, 100)
+        self.cell(0, 10, "Job Application Report | Multi-Agent Job Search System", align="C")
+        self.ln(5)
+        self.set_draw_color(30, 136, 229)
+        self.set_line_width(0.5)
+        self.line(10, 18, 200, 18)
+        self.ln(10)
+
+    def footer(self):
+        """Add footer with page number."""
+        self.set_y(-15)
+        self.set_font("Helvetica", "I", 8)
+        self.set_text_color(128, 128, 128)
+        self.cell(0, 10, f"Page {self.page_no()}/{{nb}} | Generated on {self._footer_stamp}", align="C")
+
+    def chapter_title(self, title: str):
+        """Add a chapter title with styling."""
+        self.set_font("Helvetica", "B", 14)
+        self.set_text_color(30, 136, 229)
+        self.cell(0, 10, title, ln=True)
+        self.set_draw_color(30, 136, 229)
+        self.set_line_width(0.3)
+        self.line(10, self.get_y(), 100, self.get_y())
+        self.ln(5)
+
+    def section_title(self, title: str):
+        """Add a section title."""
+        self.set_font("Helvetica", "B", 11)
+        self.set_text_color(50, 50, 50)
+        self.cell(0, 8, title, ln=True)
+        self.ln(2)
+
+    def body_text(self, text: str):
+        """Add body text with proper encoding."""
+        self.set_font("Helvetica", "", 10)
+        self.set_text_color(60, 60, 60)
+        # Handle encoding issues
+        clean_text = _to_latin1(text)
+        self.multi_cell(0, 6, clean_text)
+        self.ln(3)
+
+    def bullet_point(self, text: str):
+        """Add a bullet point."""
+        self.set_font("Helvetica", "", 10)
+        self.set_text_color(60, 60, 60)
+        clean_text = _to_latin1(text)
+        self.cell(5, 6, chr(149))  # Bullet character
+        self.multi_cell(0, 6, clean_text)
+
+
+def _new_pdf(generated_at: Optional[datetime] = None) -> ProfessionalPDF:
+    """Create a ProfessionalPDF with page-count aliasing and its first page."""
+    pdf = ProfessionalPDF(generated_at)
+    pdf.alias_nb_pages()
+    pdf.add_page()
+    return pdf
+
+
+def export_to_pdf(
+    content: str, title: str = "Job Application Report", generated_at: Optional[datetime] = None
+) -> bytes:
+    """
+    Convert markdown content to a professional PDF.
+
+    Args:
+        content: Markdown content from the agents
+        title: Title for the PDF document
+        generated_at: Time stamped on the document (defaults to now)
+
+    Returns:
+        PDF file as bytes
+    """
+    pdf = _new_pdf(generated_at)
+
+    # Add main title
+    pdf.set_font("Helvetica", "B", 20)
+    pdf.set_text_color(30, 136, 229)
+    pdf.cell(0, 15, title, ln=True, align="C")
+    pdf.ln(10)
+
+    # Process markdown content
+    header_handlers = {
+        1: pdf.chapter_title,
+        2: pdf.chapter_title,
+        3: pdf.section_title,
+        4: pdf.section_title,
+    }
+    body_lines = []
+    # Bound once; these run for nearly every line of the report
+    add_body_line = body_lines.append
+    bullet_point = pdf.bullet_point
+
+    for kind, level, text in _parse_markdown(content):
+        # Regular text - buffer consecutive lines into one paragraph
+        if kind == 'text':
+            add_body_line(text)
+            continue
+        if kind == 'header' and level not in header_handlers:
+            add_body_line(_header_line(level, text))
+            continue
+        _flush_body(pdf, body_lines)
+
+        if kind == 'blank':
+            pdf.ln(3)
+        # Handle headers
+        elif kind == 'header':
+            header_handlers[level](text)
+        # Handle bullet points and numbered lists
+        elif kind == 'bullet':
+            bullet_point(text)
+        # Handle bold text (simplified)
+        elif kind == 'bold':
+            pdf.section_title(text.strip('*'))
+        # Handle horizontal rules
+        else:
+            pdf.ln(3)
+            pdf.set_draw_color(200, 200, 200)
+            pdf.set_line_width(0.2)
+            pdf.line(10, pdf.get_y(), 200, pdf.get_y())
+            pdf.ln(5)
+    _flush_body(pdf, body_lines)
+
+    # Return PDF as bytes
+    return pdf.output()
+
+
+def export_full_report_pdf(
+    result: dict, job_topic: str, generated_at: Optional[datetime] = None
+) -> bytes:
+    """
+    Export all sections as a comprehensive PDF report.
+
+    Args:
+        result: Dictionary containing all crew results
+        job_topic: The job title/topic searched
+        generated_at: Time stamped on the document (defaults to now)
+
+    Returns:
+        PDF file as bytes
+    """
+    pdf = _new_pdf(generated_at)
+
+    # Cover page
+    pdf.set_font("Helvetica", "B", 28)
+    pdf.set_text_color(30, 136, 229)
+    pdf.ln(40)
+    pdf.cell(0, 20, "Job Application Report", ln=True, align="C")
+
+    pdf.set_font("Helvetica", "", 16)
+    pdf.set_text_color(100, 100, 100)
+    pdf.cell(0, 10, f"Position: {job_topic}", ln=True, align="C")
+
+    pdf.ln(10)
+    pdf.set_font("Helvetica", "I", 12)
+    pdf.cell(0, 10, f"Generated: {pdf.generated_at.strftime('%B %d, %Y at %H:%M')}", ln=True, align="C")
+
+    pdf.ln(30)
+    pdf.set_font("Helvetica", "", 10)
+    pdf.set_text_color(128, 128, 128)
+    pdf.multi_cell(0, 6, "This report was generated by the Multi-Agent Job Search System using AI-powered analysis of job postings and resume matching.", align="C")
+
+    # Table of Contents
+    pdf.add_page()
+    pdf.chapter_title("Table of Contents")
+    pdf.ln(5)
+    pdf.set_font("Helvetica", "", 12)
+    pdf.set_text_color(60, 60, 60)
+    for section in _TOC_SECTIONS:
+        pdf.cell(0, 10, section, ln=True)
+
+    # Section 1: Jobs
+    pdf.add_page()
+    pdf.chapter_title("1. Job Opportunities Found")
+    if result.get("jobs"):
+        process_markdown_to_pdf(pdf, result["jobs"])
+
+    # Section 2: Analysis
+    pdf.add_page()
+    pdf.chapter_title("2. Resume Match Analysis")
+    if result.get("analysis"):
+        process_markdown_to_pdf(pdf, result["analysis"])
+
+    # Section 3: Documents
+    pdf.add_page()
+    pdf.chapter_title("3. Application Documents")
+    if result.get("documents"):
+        process_markdown_to_pdf(pdf, result["documents"])
+
+    # Section 4: Full Report
+    pdf.add_page()
+    pdf.chapter_title("4. Complete Report")
+    if result.get("full_report"):
+        process_markdown_to_pdf(pdf, result["full_report"])
+
+    return pdf.output()
+
+
+def process_markdown_to_pdf(pdf: ProfessionalPDF, content: str):
+    """Process markdown content and add to PDF."""
+    body_lines = []
+    # Bound once; these run for nearly every line of the report
+    add_body_line = body_lines.append
+    bullet_point = pdf.bullet_point
+
+    for kind, level, text in _parse_markdown(content):
+        # Level 4+ headers and bold lines are plain paragraph text here
+        if kind == 'text':
+            add_body_line(text)
+            continue
+        if kind == 'header' and level > 3:
+            add_body_line(_header_line(level, text))
+            continue
+        if kind == 'bold' and text != '***':
+            add_body_line(_strip_md(text))
+            continue
+        _flush_body(pdf, body_lines)
+
+        if kind == 'blank':
+            pdf.ln(2)
+        elif kind == 'header':
+            pdf.section_title(text)
+        elif kind == 'bullet':
+            bullet_point(text)
+        else:
+            pdf.ln(2)
+            pdf.set_draw_color(200, 200, 200)
+            pdf.line(10, pdf.get_y(), 200, pdf.get_y())
+            pdf.ln(3)
+    _flush_body(pdf, body_lines)
@@ -0,0 +1,201 @@
+"""Crew assembly tests for job_crew. No LLM or search calls are made."""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import job_crew
+
+
+@pytest.fixture(autouse=True)
+def no_env_keys(monkeypatch):
+    """Run without Gemini keys in the environment, so only the passed key can work."""
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    job_crew._get_agent_llm.cache_clear()
+    # Side tasks would start a real LLM call on a worker thread
+    monkeypatch.setattr(job_crew._SideTask, "start", lambda self, context: None)
+    yield
+    job_crew._get_agent_llm.cache_clear()
+
+
+def build(**kwargs):
+    return job_crew._build_crew(
+        "Python Developer", "Python, Django, AWS", "gemini-key", "serper-key",
+        "Remote", "Not specified", "Any", False, **kwargs,
+    )
+
+
+def test_build_crew_with_stream_report_and_nothing_cached():
+    crew, search_task, resume_profile_task, write_task, prep, profile = build(stream_report=True)
+
+    # The write task is streamed, so the crew only runs the research, and the
+    # profile runs beside it rather than leaving two async tasks at the end
+    assert crew.tasks == [search_task]
+    assert profile is not None and profile.task is resume_profile_task
+    assert write_task not in crew.tasks
+
+
+def test_agents_use_the_key_passed_to_the_crew():
+    crew, *_ = build()
+
+    assert {agent.llm.api_key for agent in crew.agents} == {"gemini-key"}
+    assert {agent.llm.model for agent in crew.agents} == {job_crew.FAST_MODEL, job_crew.WRITER_MODEL}
+
+
+def test_build_crew_without_streaming_runs_every_task():
+    crew, search_task, resume_profile_task, write_task, prep, profile = build()
+
+    assert crew.tasks == [search_task, resume_profile_task, write_task]
+    assert profile is None
+
+
+def test_build_crew_with_stream_report_and_research_cached():
+    crew, search_task, resume_profile_task, write_task, prep, profile = build(
+        stream_report=True, cached_jobs="## Job Opportunities Found",
+    )
+
+    assert search_task is None
+    assert crew.tasks == [resume_profile_task]
+    assert profile is None
+
+
+def stream_report(monkeypatch, pieces):
+    """Run _stream_report over a fake Gemini stream, returning (tokens, stages)."""
+    llm = SimpleNamespace(stream=lambda messages: (SimpleNamespace(content=piece) for piece in pieces))
+    monkeypatch.setattr(job_crew, "_get_llm", lambda *args: llm)
+    tokens, stages = [], []
+    run = {
+        "write_task": SimpleNamespace(
+            agent=SimpleNamespace(role="Writer", backstory="", goal=""),
+            description="Write the report.",
+            expected_output="",
+        ),
+        "search_task": None,
+        "resume_profile_task": None,
+        "profile": None,
+        "gemini_key": "gemini-key",
+        "on_stage": lambda key, output: stages.append((key, output)),
+    }
+    written = job_crew._stream_report(run, tokens.append)
+    assert written == "".join(pieces)
+    return tokens, stages
+
+
+def test_stream_report_holds_back_the_analysis(monkeypatch):
+    tokens, stages = stream_report(
+        monkeypatch, ["## Match Analysis\nGood fit.\n\n# Job Appli", "cation Report\n", "## Executive Summary"],
+    )
+
+    assert stages == [("analysis", "## Match Analysis\nGood fit.")]
+    assert "".join(tokens) == "# Job Application Report\n## Executive Summary"
+
+
+def test_stream_report_heading_first_streams_at_once(monkeypatch):
+    tokens, stages = stream_report(monkeypatch, ["# Job Application Report\n", "## Executive Summary"])
+
+    assert tokens == ["# Job Application Report\n", "## Executive Summary"]
+    assert stages == []
+
+
+def test_stream_report_without_heading_streams_after_the_wait(monkeypatch):
+    monkeypatch.setattr(job_crew, "REPORT_HEADING_WAIT_SECONDS", 0)
+    tokens, stages = stream_report(monkeypatch, ["## Executive Summary\n", "Strong match."])
+
+    assert "".join(tokens) == "## Executive Summary\nStrong match."
+    assert stages == []
+
+
+def test_cached_research_is_ranked_against_the_current_resume(monkeypatch):
+    report = job_crew.JobSearchReport(jobs=[
+        job_crew.JobPosting(title="Data Engineer", company="Acme", skills=["Spark"]),
+        job_crew.JobPosting(title="Backend Developer", company="Zeta", skills=["Django"]),
+    ])
+
+    def embed_texts(texts, gemini_key):
+        # One dimension per skill, so similarity follows the shared skill
+        return [[float("Spark" in text), float("Django" in text)] for text in texts]
+
+    monkeypatch.setattr(job_crew, "embed_texts", embed_texts)
+    django_first, _ = job_crew._rank_cached_research(report.model_dump_json(), "Django, Python", "gemini-key")
+    spark_first, _ = job_crew._rank_cached_research(report.model_dump_json(), "Spark, Scala", "gemini-key")
+
+    assert "Job 1: Backend Developer at Zeta" in django_first
+    assert "Job 1: Data Engineer at Acme" in spark_first
+    assert job_crew._rank_cached_research("## Jobs", "Django", "gemini-key") == ("## Jobs", "## Jobs")
+
+
+def test_cached_research_context_keeps_top_jobs_within_budget(monkeypatch):
+    monkeypatch.setattr(job_crew, "embed_texts", lambda texts, gemini_key: [[1.0] for _ in texts])
+    report = job_crew.JobSearchReport(jobs=[
+        job_crew.JobPosting(title=f"Job {number}", company="Acme", full_description="x" * 60000)
+        for number in range(7)
+    ])
+
+    jobs, context = job_crew._rank_cached_research(report.model_dump_json(), "Python", "gemini-key")
+
+    assert jobs.count("### Job") == 7
+    assert context.count('"title"') == job_crew.CONTEXT_TOP_JOBS
+    assert len(context) <= job_crew.CONTEXT_TOKEN_BUDGET * job_crew.CHARS_PER_TOKEN
+
+
+def test_scrape_cache_keeps_only_successful_scrapes(monkeypatch):
+    fetched = []
+    pages = {"https://jobs.example/ok/": "x" * 200}
+
+    def scrape(self, website_url):
+        fetched.append(website_url)
+        if website_url not in pages:
+            raise TimeoutError("Read timeout")
+        return pages[website_url]
+
+    monkeypatch.setattr(job_crew.ScrapeWebsiteTool, "_run", scrape)
+    monkeypatch.setattr(job_crew, "_scrape_cache", job_crew.OrderedDict())
+    tool = job_crew.SafeScrapeWebsiteTool()
+
+    for _ in range(2):
+        tool._run("https://jobs.example/ok/")
+        notice = tool._run("https://jobs.example/slow")
+
+    assert "SCRAPING NOTICE" in notice
+    assert fetched == ["https://jobs.example/ok/", "https://jobs.example/slow", "https://jobs.example/slow"]
+
+
+def test_serper_cache_is_saved_only_when_a_search_was_fetched(monkeypatch):
+    posted, saves = [], []
+    response = SimpleNamespace(raise_for_status=lambda: None, json=lambda: {"organic": [{"link": "https://a"}]})
+
+    def post(url, json, **kwargs):
+        posted.append(json["q"])
+        return response
+
+    monkeypatch.setattr(job_crew._serper_session, "post", post)
+    monkeypatch.setattr(job_crew, "_serper_cache", job_crew.OrderedDict())
+    monkeypatch.setattr(job_crew, "_save_serper_cache", lambda: saves.append(len(job_crew._serper_cache)))
+    tool = job_crew.ConcurrentSerperDevTool(api_key="serper-key", query_suffixes=["remote"])
+
+    first = tool._run(search_query="python developer")
+    second = tool._run(search_query="python developer")
+
+    assert first == second
+    assert posted == ["python developer", "python developer remote"]
+    assert saves == [2]
+
+
+def test_research_cache_is_written_outside_the_lookup_lock(monkeypatch, tmp_path):
+    locked_during_write = []
+    dump = job_crew.json.dump
+
+    def checked_dump(obj, cache_file, **kwargs):
+        locked_during_write.append(job_crew._research_cache_lock.locked())
+        dump(obj, cache_file, **kwargs)
+
+    monkeypatch.setattr(job_crew.json, "dump", checked_dump)
+    monkeypatch.setattr(job_crew, "RESEARCH_CACHE_PATH", str(tmp_path / "research_cache.json"))
+    monkeypatch.setattr(job_crew, "_research_cache", [])
+    job_crew._research_cache_store("Python Developer", [1.0], ("Any",), "## Jobs")
+
+    assert locked_during_write == [False]
+    assert (tmp_path / "research_cache.json").exists()
+    assert os.path.dirname(job_crew.CACHE_DIR) == os.path.dirname(os.path.abspath(job_crew.__file__))
@@ -0,0 +1,190 @@
+"""PDF rendering tests, checked against self-contained per-line reference renderers."""
+
+import re
+from datetime import datetime, timezone
+
+import pdf_export
+from pdf_export import _new_pdf
+
+GENERATED_AT = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+SAMPLE_REPORT = """# Job Application Report
+Intro line one with **bold** and *italic* text.
+Intro line two with a [link](https://example.com).
+
+## Executive Summary
+**Strong match**
+A paragraph right after a bold line.
+**Key Skills:** Python, Django
+***bold italic***
+**use `pip`** for *a **nested** case*
+***
+Text after a star rule.
+---
+### Top Roles
+- Backend Developer at Zeta
+
+* Data Engineer at Acme
+
+1. Apply to Zeta first
+
+2. Follow up with Acme
+
+#### Level four header
+Body under level four.
+##### Level five header
+###### Level six header
+Body under level six, café — naïve “quotes”.
+**
+
+#NoSpace is plain text
+Final paragraph
+spanning two lines."""
+
+
+def strip_md(line):
+    """Inline markdown stripping written out as the original three re.sub passes."""
+    line = re.sub(r'\*\*(.*?)\*\*', r'\1', line)
+    line = re.sub(r'\*(.*?)\*', r'\1', line)
+    return re.sub(r'`(.*?)`', r'\1', line)
+
+
+def header_level(line):
+    match = re.match(r'(#+) ', line)
+    return len(match.group(1)) if match else 0
+
+
+def is_block_line(line):
+    return line[:2] in ('- ', '* ') or re.match(r'\d+\.', line) or line in ('---', '***')
+
+
+def flush(pdf, body_lines):
+    if body_lines:
+        pdf.body_text('\n'.join(body_lines))
+        body_lines.clear()
+
+
+def render_markdown_per_line(pdf, content):
+    """export_to_pdf's markdown handling, one line at a time."""
+    header_handlers = {1: pdf.chapter_title, 2: pdf.chapter_title, 3: pdf.section_title, 4: pdf.section_title}
+    body_lines = []
+    for line in content.split('\n'):
+        line = line.strip()
+        level = header_level(line)
+        is_bold = line.startswith('**') and line.endswith('**')
+        if line and level not in header_handlers and not is_block_line(line) and not is_bold:
+            body_lines.append(strip_md(line))
+            continue
+        flush(pdf, body_lines)
+        if not line:
+            pdf.ln(3)
+        elif level in header_handlers:
+            header_handlers[level](line[level + 1:])
+        elif line[:2] in ('- ', '* '):
+            pdf.bullet_point(line[2:])
+        elif re.match(r'\d+\.', line):
+            pdf.bullet_point(line)
+        elif is_bold:
+            pdf.section_title(line.strip('*'))
+        else:
+            pdf.ln(3)
+            pdf.set_draw_color(200, 200, 200)
+            pdf.set_line_width(0.2)
+            pdf.line(10, pdf.get_y(), 200, pdf.get_y())
+            pdf.ln(5)
+    flush(pdf, body_lines)
+
+
+def process_markdown_per_line(pdf, content):
+    """process_markdown_to_pdf's markdown handling, one line at a time."""
+    body_lines = []
+    for line in content.split('\n'):
+        line = line.strip()
+        level = header_level(line)
+        if line and not 1 <= level <= 3 and not is_block_line(line):
+            body_lines.append(strip_md(line))
+            continue
+        flush(pdf, body_lines)
+        if not line:
+            pdf.ln(2)
+        elif 1 <= level <= 3:
+            pdf.section_title(line[level + 1:])
+        elif line[:2] in ('- ', '* '):
+            pdf.bullet_point(line[2:])
+        elif re.match(r'\d+\.', line):
+            pdf.bullet_point(line)
+        else:
+            pdf.ln(2)
+            pdf.set_draw_color(200, 200, 200)
+            pdf.line(10, pdf.get_y(), 200, pdf.get_y())
+            pdf.ln(3)
+    flush(pdf, body_lines)
+
+
+def test_parse_markdown_tokens_for_edge_lines():
+    tokens = pdf_export._parse_markdown(SAMPLE_REPORT)
+
+    assert tokens[:2] == (
+        ('header', 1, 'Job Application Report'),
+        ('text', 0, 'Intro line one with bold and italic text.'),
+    )
+    for token in [
+        ('bold', 0, '**Strong match**'),
+        ('text', 0, 'Key Skills: Python, Django'),
+        ('bold', 0, '***bold italic***'),
+        ('text', 0, 'use pip for a nested case'),
+        ('bold', 0, '***'),
+        ('rule', 0, '---'),
+        ('bullet', 0, 'Backend Developer at Zeta'),
+        ('bullet', 0, 'Data Engineer at Acme'),
+        ('bullet', 0, '1. Apply to Zeta first'),
+        ('header', 4, 'Level four header'),
+        ('header', 5, 'Level five header'),
+        ('header', 6, 'Level six header'),
+        ('bold', 0, '**'),
+        ('text', 0, '#NoSpace is plain text'),
+    ]:
+        assert token in tokens, token
+
+
+def test_export_to_pdf_matches_per_line_rendering():
+    expected = _new_pdf(GENERATED_AT)
+    expected.set_font("Helvetica", "B", 20)
+    expected.set_text_color(30, 136, 229)
+    expected.cell(0, 15, "Sample Report", ln=True, align="C")
+    expected.ln(10)
+    render_markdown_per_line(expected, SAMPLE_REPORT)
+
+    assert pdf_export.export_to_pdf(SAMPLE_REPORT, "Sample Report", GENERATED_AT) == bytes(expected.output())
+
+
+def test_process_markdown_to_pdf_matches_per_line_rendering():
+    expected = _new_pdf(GENERATED_AT)
+    process_markdown_per_line(expected, SAMPLE_REPORT)
+    rendered = _new_pdf(GENERATED_AT)
+    pdf_export.process_markdown_to_pdf(rendered, SAMPLE_REPORT)
+
+    assert rendered.output() == expected.output()
+
+
+def test_strip_md_matches_the_three_pass_regex_chain():
+    lines = [
+        "***bold italic***",
+        "**use `pip`**",
+        "**a *b* c**",
+        "**a*b** c*",
+        "plain text",
+        "*one* and **two** and `three`",
+        "**unclosed bold",
+        "a * b * c",
+        "`code with *star*`",
+        "**",
+        "***",
+    ]
+    for line in lines:
+        expected = re.sub(r'\*\*(.*?)\*\*', r'\1', line)
+        expected = re.sub(r'\*(.*?)\*', r'\1', expected)
+        expected = re.sub(r'`(.*?)`', r'\1', expected)
+        assert pdf_export._strip_md(line) == expected, line
+
+    assert pdf_export._strip_md("**use `pip`**") == "use pip"